@@ -0,0 +1,67 @@
+"""Представление моделей в JSON API.
+
+Каждая функция возвращает все поля объекта; FIELDS перечисляют их для
+выборки ?fields=.
+"""
+from django.urls import reverse
+
+POST_FIELDS = (
+    'id', 'url', 'text', 'author', 'group', 'image', 'video', 'pub_date',
+    'edit_date', 'likes_count', 'comments_count', 'is_liked',
+)
+COMMENT_FIELDS = ('id', 'post', 'author', 'text', 'pub_date')
+GROUP_FIELDS = ('id', 'slug', 'title', 'description')
+PROFILE_FIELDS = (
+    'username', 'first_name', 'last_name', 'posts_count', 'followers_count',
+    'is_following',
+)
+
+
+def post_data(post, request):
+    return {
+        'id': post.pk,
+        'url': request.build_absolute_uri(
+            reverse('api:post', kwargs={'post_id': post.pk})
+        ),
+        'text': post.text,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': request.build_absolute_uri(post.image.url)
+        if post.image else None,
+        'video': post.video or None,
+        'pub_date': post.pub_date,
+        'edit_date': post.edit_date,
+        'likes_count': post.likes_count,
+        'comments_count': post.comments_count,
+        'is_liked': getattr(post, 'is_liked', False),
+    }
+
+
+def comment_data(comment, request):
+    return {
+        'id': comment.pk,
+        'post': comment.post_id,
+        'author': comment.author.username,
+        'text': comment.text,
+        'pub_date': comment.pub_date,
+    }
+
+
+def group_data(group, request):
+    return {
+        'id': group.pk,
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+    }
+
+
+def profile_data(user, request):
+    return {
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'posts_count': user.profile.posts_count,
+        'followers_count': user.profile.followers_count,
+        'is_following': getattr(user, 'is_following', False),
+    }
@@ -0,0 +1,123 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Like, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='client')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='api')
+        for i in range(5):
+            Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                group=cls.group)
+        cls.post = Post.objects.create(text='Последний', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_cursor_pagination_and_fields(self):
+        """Список листается курсором без повторов, ?fields= сужает ответ."""
+        address = reverse('api:posts') + '?limit=4&fields=id,likes_count'
+        response = self.guest.get(address)
+        data = response.json()
+        self.assertEqual(len(data['results']), 4)
+        self.assertEqual(set(data['results'][0]), {'id', 'likes_count'})
+        rest = self.guest.get(data['next']).json()
+        self.assertIsNone(rest['next'])
+        ids = [item['id'] for item in data['results'] + rest['results']]
+        self.assertEqual(
+            ids, list(Post.objects.order_by('-pub_date', '-pk')
+                      .values_list('pk', flat=True))
+        )
+        self.assertEqual(
+            self.guest.get(reverse('api:posts') + '?fields=secret')
+            .status_code, 400
+        )
+
+    def test_conditional_get(self):
+        """Повторный запрос с If-None-Match получает 304 без тела, а
+        If-Modified-Since без ETag не обходит изменившиеся счетчики."""
+        address = reverse('api:post', kwargs={'post_id': self.post.pk})
+        response = self.guest.get(address)
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotIn('Last-Modified', self.guest.get(reverse('api:posts')))
+        self.assertEqual(self.guest.get(
+            address, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        ).status_code, 200)
+        cached = self.guest.get(address,
+                                HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+
+    def test_mutations_require_login(self):
+        """Изменения без входа получают 401, чужой пост удалить нельзя."""
+        like = reverse('api:post_like', kwargs={'post_id': self.post.pk})
+        post = reverse('api:post', kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.guest.post(like).status_code, 401)
+        self.assertEqual(self.guest.get(reverse('api:feed')).status_code, 401)
+        self.assertEqual(self.client.delete(post).status_code, 403)
+        self.assertEqual(self.client.put(post).status_code, 405)
+
+    def test_like_returns_counts(self):
+        """Лайк и его снятие возвращают новое значение счетчика."""
+        address = reverse('api:post_like', kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.client.post(address).json(),
+                         {'liked': True, 'likes_count': 1})
+        self.assertEqual(self.client.post(address).json()['likes_count'], 1)
+        self.assertEqual(self.client.delete(address).json(),
+                         {'liked': False, 'likes_count': 0})
+        self.assertFalse(Like.objects.exists())
+
+    def test_follow_returns_counts(self):
+        """Подписка отражается в счетчике и в ленте, на себя - 400."""
+        address = reverse('api:profile_follow',
+                          kwargs={'username': self.author.username})
+        self.assertEqual(self.client.post(address).json(),
+                         {'following': True, 'followers_count': 1})
+        profile = self.client.get(
+            reverse('api:profile', kwargs={'username': 'author'})
+        ).json()
+        self.assertTrue(profile['is_following'])
+        feed = self.client.get(reverse('api:feed')).json()
+        self.assertEqual(feed['results'][0]['id'], self.post.pk)
+        self.assertEqual(self.client.delete(address).json()['followers_count'],
+                         0)
+        self.assertFalse(Follow.objects.exists())
+        own = reverse('api:profile_follow', kwargs={'username': 'client'})
+        self.assertEqual(self.client.post(own).status_code, 400)
+
+    def test_create_post_and_comments(self):
+        """Пост и комментарий создаются из JSON, счетчики обновляются."""
+        response = self.client.post(
+            reverse('api:posts'), {'text': 'Из API', 'group': 'api'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(pk=response.json()['id'])
+        self.assertEqual((post.author, post.group), (self.user, self.group))
+        response = self.client.post(
+            reverse('api:posts'), {'text': 'Мимо', 'group': 'nope'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('group', response.json()['errors'])
+        self.assertFalse(Post.objects.filter(text='Мимо').exists())
+        address = reverse('api:post_comments', kwargs={'post_id': post.pk})
+        response = self.client.post(address, {'text': 'Комментарий'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['comments_count'], 1)
+        comment = Comment.objects.get()
+        self.assertEqual(len(self.guest.get(address).json()['results']), 1)
+        response = self.client.delete(
+            reverse('api:comment', kwargs={'comment_id': comment.pk})
+        )
+        self.assertEqual(response.json(), {'comments_count': 0})
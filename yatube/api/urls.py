@@ -0,0 +1,23 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.PostList.as_view(), name='posts'),
+    path('posts/<int:post_id>/', views.PostDetail.as_view(), name='post'),
+    path('posts/<int:post_id>/like/', views.PostLike.as_view(),
+         name='post_like'),
+    path('posts/<int:post_id>/comments/', views.CommentList.as_view(),
+         name='post_comments'),
+    path('comments/<int:comment_id>/', views.CommentDetail.as_view(),
+         name='comment'),
+    path('groups/', views.GroupList.as_view(), name='groups'),
+    path('groups/<slug:slug>/', views.GroupDetail.as_view(), name='group'),
+    path('profiles/<str:username>/', views.ProfileDetail.as_view(),
+         name='profile'),
+    path('profiles/<str:username>/follow/', views.ProfileFollow.as_view(),
+         name='profile_follow'),
+    path('feed/', views.Feed.as_view(), name='feed'),
+]
@@ -0,0 +1,307 @@
+"""JSON API /api/v1/ поверх моделей постов.
+
+Списки листаются курсором (?cursor=, ?limit=), поля выбираются
+параметром ?fields=, GET-ответы несут ETag и отдают 304 на условный
+запрос. Изменения - POST и DELETE с сессионной авторизацией
+и CSRF-токеном, они возвращают новые значения счетчиков.
+"""
+import hashlib
+import json
+
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.generic import View
+
+from core.paginators import CursorPaginator, InvalidCursor
+from core.uploads import LimitedUploadMixin
+from posts import actions
+from posts.feed import feed_posts
+from posts.follows import is_following
+from posts.forms import CommentForm, PostForm
+from posts.models import Comment, Group, Post, User
+from .serializers import (
+    COMMENT_FIELDS, GROUP_FIELDS, POST_FIELDS, PROFILE_FIELDS, comment_data,
+    group_data, post_data, profile_data
+)
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def error(status, detail):
+    return JsonResponse({'detail': detail}, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def conditional_json(request, data, status=200):
+    """JsonResponse с ETag по содержимому; на совпавший условный GET - 304
+    без тела.
+
+    Last-Modified не ставится: даты постов не сдвигаются, когда меняются
+    счетчики, пост удаляется или записи переезжают между страницами, и
+    запрос с одним If-Modified-Since получил бы устаревший 304.
+    """
+    response = JsonResponse(data, status=status,
+                            json_dumps_params={'ensure_ascii': False})
+    patch_vary_headers(response, ('Cookie',))
+    if request.method != 'GET':
+        return response
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    response['ETag'] = etag
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+class ApiView(View):
+    """Общая часть ресурсов: ошибки в JSON, авторизация для изменений,
+    выборка полей и курсорная пагинация."""
+    fields = ()
+    serializer = None
+    public_methods = ('get', 'head', 'options')
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            if (request.method.lower() not in self.public_methods
+                    and not request.user.is_authenticated):
+                raise ApiError(401, 'Нужна авторизация.')
+            return super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return error(404, 'Не найдено.')
+        except ApiError as e:
+            return error(e.status, e.detail)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = error(405, 'Метод не поддерживается.')
+        response['Allow'] = ', '.join(
+            method.upper() for method in self._allowed_methods()
+        )
+        return response
+
+    def selected_fields(self):
+        raw = self.request.GET.get('fields')
+        if not raw:
+            return self.fields
+        fields = [field for field in raw.split(',') if field]
+        unknown = sorted(set(fields) - set(self.fields))
+        if unknown:
+            raise ApiError(400, f'Неизвестные поля: {", ".join(unknown)}.')
+        return fields
+
+    def serialize(self, obj):
+        data = self.serializer(obj, self.request)
+        return {field: data[field] for field in self.selected_fields()}
+
+    def data(self):
+        """Тело запроса: JSON или обычная форма."""
+        if self.request.content_type == 'application/json':
+            try:
+                data = json.loads(self.request.body or b'{}')
+            except ValueError:
+                raise ApiError(400, 'Тело запроса - не JSON.')
+            if not isinstance(data, dict):
+                raise ApiError(400, 'Ожидается JSON-объект.')
+            return data
+        return self.request.POST
+
+    def paginate(self, queryset):
+        try:
+            limit = int(self.request.GET.get('limit', PAGE_SIZE))
+        except ValueError:
+            raise ApiError(400, 'limit должен быть числом.')
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        try:
+            page = CursorPaginator(queryset, limit).page(
+                self.request.GET.get('cursor')
+            )
+        except InvalidCursor as e:
+            raise ApiError(400, str(e))
+        next_url = None
+        if page.has_next():
+            params = self.request.GET.copy()
+            params['cursor'] = page.next_cursor
+            next_url = self.request.build_absolute_uri(
+                f'{self.request.path}?{params.urlencode()}'
+            )
+        return conditional_json(
+            self.request,
+            {'results': [self.serialize(obj) for obj in page],
+             'next': next_url},
+        )
+
+
+def validation_error(form):
+    return JsonResponse({'detail': 'Неверные данные.', 'errors': form.errors},
+                        status=400, json_dumps_params={'ensure_ascii': False})
+
+
+class PostList(LimitedUploadMixin, ApiView):
+    fields = POST_FIELDS
+    serializer = staticmethod(post_data)
+
+    def get(self, request):
+        posts = Post.objects.for_list(request.user)
+        if 'group' in request.GET:
+            posts = posts.filter(group__slug=request.GET['group'])
+        if 'author' in request.GET:
+            posts = posts.filter(author__username=request.GET['author'])
+        return self.paginate(posts)
+
+    def post(self, request):
+        data = self.data()
+        slug = data.get('group')
+        if slug:
+            group = Group.objects.filter(slug=slug).first()
+            data = dict(data.items(), group=group.pk if group else '')
+        form = PostForm(data, files=request.FILES or None)
+        if slug and not data['group']:
+            form.add_error('group', f'Нет группы {slug}.')
+        if not form.is_valid():
+            return validation_error(form)
+        post = actions.save_new_post(form, request.user)
+        return conditional_json(request, self.serialize(post), status=201)
+
+
+class PostDetail(ApiView):
+    fields = POST_FIELDS
+    serializer = staticmethod(post_data)
+
+    def get(self, request, post_id):
+        post = get_object_or_404(
+            Post.objects.for_list(request.user), pk=post_id
+        )
+        return conditional_json(request, self.serialize(post))
+
+    def delete(self, request, post_id):
+        post = get_object_or_404(Post, pk=post_id)
+        if post.author != request.user:
+            raise ApiError(403, 'Удалить пост может только автор.')
+        actions.delete_post(post)
+        return HttpResponse(status=204)
+
+
+class PostLike(ApiView):
+    def respond(self, post_id):
+        likes_count = Post.objects.values_list(
+            'likes_count', flat=True
+        ).get(pk=post_id)
+        return JsonResponse({
+            'liked': self.request.method == 'POST',
+            'likes_count': likes_count,
+        })
+
+    def post(self, request, post_id):
+        actions.like(request.user, get_object_or_404(Post, pk=post_id))
+        return self.respond(post_id)
+
+    def delete(self, request, post_id):
+        actions.unlike(request.user, get_object_or_404(Post, pk=post_id))
+        return self.respond(post_id)
+
+
+class CommentList(ApiView):
+    fields = COMMENT_FIELDS
+    serializer = staticmethod(comment_data)
+
+    def get(self, request, post_id):
+        post = get_object_or_404(Post, pk=post_id)
+        return self.paginate(post.comments.select_related('author'))
+
+    def post(self, request, post_id):
+        post = get_object_or_404(Post, pk=post_id)
+        form = CommentForm(self.data())
+        if not form.is_valid():
+            return validation_error(form)
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = post
+        actions.add_comment(comment)
+        post.refresh_from_db(fields=['comments_count'])
+        return JsonResponse({
+            'comment': self.serialize(comment),
+            'comments_count': post.comments_count,
+        }, status=201, json_dumps_params={'ensure_ascii': False})
+
+
+class CommentDetail(ApiView):
+    def delete(self, request, comment_id):
+        comment = get_object_or_404(Comment, pk=comment_id)
+        if comment.author != request.user:
+            raise ApiError(403, 'Удалить комментарий может только автор.')
+        actions.delete_comment(comment)
+        return JsonResponse({
+            'comments_count': Post.objects.values_list(
+                'comments_count', flat=True
+            ).get(pk=comment.post_id),
+        })
+
+
+class GroupList(ApiView):
+    fields = GROUP_FIELDS
+    serializer = staticmethod(group_data)
+
+    def get(self, request):
+        return conditional_json(request, {
+            'results': [self.serialize(group)
+                        for group in Group.objects.order_by('title')],
+        })
+
+
+class GroupDetail(ApiView):
+    fields = GROUP_FIELDS
+    serializer = staticmethod(group_data)
+
+    def get(self, request, slug):
+        group = get_object_or_404(Group, slug=slug)
+        return conditional_json(request, self.serialize(group))
+
+
+class ProfileDetail(ApiView):
+    fields = PROFILE_FIELDS
+    serializer = staticmethod(profile_data)
+
+    def get(self, request, username):
+        user = get_object_or_404(
+            User.objects.select_related('profile'), username=username
+        )
+        user.is_following = is_following(request.user, user)
+        return conditional_json(request, self.serialize(user))
+
+
+class ProfileFollow(ApiView):
+    def respond(self, author):
+        author.profile.refresh_from_db(fields=['followers_count'])
+        return JsonResponse({
+            'following': self.request.method == 'POST',
+            'followers_count': author.profile.followers_count,
+        })
+
+    def post(self, request, username):
+        author = get_object_or_404(User, username=username)
+        if author == request.user:
+            raise ApiError(400, 'Нельзя подписаться на себя.')
+        actions.follow(request.user, author)
+        return self.respond(author)
+
+    def delete(self, request, username):
+        author = get_object_or_404(User, username=username)
+        actions.unfollow(request.user, author)
+        return self.respond(author)
+
+
+class Feed(ApiView):
+    fields = POST_FIELDS
+    serializer = staticmethod(post_data)
+    public_methods = ()
+
+    def get(self, request):
+        return self.paginate(
+            feed_posts(Post.objects.for_list(request.user), request.user)
+        )
@@ -0,0 +1,193 @@
+import json
+import statistics
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from core.metrics import percentile
+from core.middleware import QueryTimer
+from posts import actions
+from posts.management.commands.explain_listings import busiest
+from posts.models import Comment, Follow, Group, Like, Post, User
+
+BASELINE = Path(__file__).resolve().parents[2] / 'baseline.json'
+RUNS = 50
+WARMUP = 5
+TOLERANCE = 0.2
+
+# before и after выполняются вне замера: готовят запись и возвращают базу
+# в исходное состояние.
+Scenario = namedtuple('Scenario', 'name request before after',
+                      defaults=(None, None))
+
+
+class Command(BaseCommand):
+    help = ('Замеряет p50/p95 времени ответа и число SQL-запросов основных '
+            'страниц и записей на текущей базе (заполните ее '
+            'seed_benchmark), печатает JSON и сравнивает с сохраненной '
+            'базовой линией.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=RUNS)
+        parser.add_argument('--warmup', type=int, default=WARMUP,
+                            help='Незамеряемые прогоны перед замером.')
+        parser.add_argument('--search', default='пост',
+                            help='Запрос для сценария поиска.')
+        parser.add_argument('--output', default='-',
+                            help='Файл для JSON, "-" - stdout.')
+        parser.add_argument('--baseline', default=str(BASELINE),
+                            help='JSON прошлого запуска для сравнения.')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Сохранить результат как базовую линию.')
+        parser.add_argument(
+            '--tolerance', type=float, default=TOLERANCE,
+            help='Допустимый рост p95 относительно базовой линии.'
+        )
+
+    def handle(self, *args, **options):
+        self.runs = options['runs']
+        self.warmup = options['warmup']
+        results = {}
+        for scenario in self.scenarios(options['search']):
+            self.stderr.write(f'{scenario.name}...')
+            results[scenario.name] = self.measure(scenario)
+        report = {'meta': self.meta(), 'results': results}
+        self.write(report, options['output'])
+        baseline = Path(options['baseline'])
+        if options['save_baseline']:
+            self.write(report, baseline)
+            self.stderr.write(f'Базовая линия сохранена в {baseline}')
+        elif baseline.exists():
+            self.compare(results, json.loads(baseline.read_text()),
+                         options['tolerance'])
+
+    def scenarios(self, search):
+        reader_id = busiest(Follow.objects, 'user')
+        group_id = busiest(Post.objects.exclude(group=None), 'group')
+        post = Post.objects.order_by('-likes_count').first()
+        if not (reader_id and group_id and post):
+            raise CommandError('В базе нет подписок, групп или постов, '
+                               'сначала запустите seed_benchmark.')
+        reader = User.objects.get(pk=reader_id)
+        group = Group.objects.get(pk=group_id)
+        author = User.objects.order_by('-profile__followers_count').first()
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(reader)
+        anonymous = Client(HTTP_HOST='localhost')
+        post_kwargs = {'post_id': post.pk}
+
+        def page(name, **kwargs):
+            return lambda: client.get(reverse(name, kwargs=kwargs))
+
+        liked = Like.objects.filter(user=reader, post=post).exists()
+
+        def restore_like():
+            (actions.like if liked else actions.unlike)(reader, post)
+
+        def delete_comment():
+            actions.delete_comment(Comment.objects.filter(
+                author=reader, post=post
+            ).latest('pk'))
+
+        return (
+            Scenario('index', page('posts:index')),
+            Scenario('index_anonymous',
+                     lambda: anonymous.get(reverse('posts:index'))),
+            Scenario('group_list', page('posts:group_list', slug=group.slug)),
+            Scenario('profile',
+                     page('posts:profile', username=author.username)),
+            Scenario('post_detail', page('posts:post_detail', **post_kwargs)),
+            Scenario('follow_index', page('posts:follow_index')),
+            Scenario('search', lambda: client.get(reverse('posts:search'),
+                                                  {'search': search})),
+            Scenario(
+                'like',
+                lambda: client.post(reverse('posts:post_like',
+                                            kwargs=post_kwargs)),
+                before=lambda: actions.unlike(reader, post),
+                after=restore_like,
+            ),
+            Scenario(
+                'unlike',
+                lambda: client.post(reverse('posts:post_unlike',
+                                            kwargs=post_kwargs)),
+                before=lambda: actions.like(reader, post),
+                after=restore_like,
+            ),
+            Scenario(
+                'comment',
+                lambda: client.post(reverse('posts:add_comment',
+                                            kwargs=post_kwargs),
+                                    {'text': 'Комментарий бенчмарка'}),
+                after=delete_comment,
+            ),
+        )
+
+    def measure(self, scenario):
+        timings, queries = [], []
+        for run in range(self.warmup + self.runs):
+            if scenario.before:
+                scenario.before()
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                started = time.perf_counter()
+                response = scenario.request()
+                elapsed = (time.perf_counter() - started) * 1000
+            if scenario.after:
+                scenario.after()
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{scenario.name}: ответ {response.status_code}'
+                )
+            if run >= self.warmup:
+                timings.append(elapsed)
+                queries.append(timer.queries)
+        timings.sort()
+        return {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'queries': max(queries),
+        }
+
+    def meta(self):
+        return {
+            'date': timezone.now().isoformat(),
+            'vendor': connection.vendor,
+            'runs': self.runs,
+            'rows': {
+                model.__name__: model.objects.count()
+                for model in (User, Post, Comment, Like, Follow)
+            },
+        }
+
+    def write(self, report, output):
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if output == '-':
+            self.stdout.write(text)
+        else:
+            Path(output).write_text(text + '\n')
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, result in results.items():
+            base = baseline['results'].get(name)
+            if base is None:
+                continue
+            line = (f'{name}: p95 {base["p95_ms"]} -> {result["p95_ms"]} мс, '
+                    f'запросов {base["queries"]} -> {result["queries"]}')
+            if (result['p95_ms'] > base['p95_ms'] * (1 + tolerance)
+                    or result['queries'] > base['queries']):
+                regressions.append(line)
+                self.stderr.write(self.style.ERROR(line))
+            else:
+                self.stderr.write(line)
+        if regressions:
+            raise CommandError(
+                f'Регрессий относительно базовой линии: {len(regressions)}.'
+            )
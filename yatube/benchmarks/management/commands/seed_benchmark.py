@@ -0,0 +1,123 @@
+import itertools
+
+from django.conf import settings
+from django.core.management import call_command
+
+from posts.management.commands.seed_posts import (
+    Command as SeedPostsCommand, explicit_pub_date
+)
+from posts.models import FeedEntry, Follow, Like, Post
+
+USERS_PER_QUERY = 500  # ленты раскладываются порциями подписчиков
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса рангов 1..count по закону Ципфа: первые элементы
+    выбираются намного чаще остальных."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+class Command(SeedPostsCommand):
+    help = ('Заполняет базу объемами для бенчмарков: пользователи, посты, '
+            'комментарии, лайки с перекосом к популярным постам и граф '
+            'подписок с перекосом к популярным авторам. Затем пересчитывает '
+            'счетчики, раскладывает ленты и строит поисковый индекс.')
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(users=100000, posts=1000000, comments=1000000)
+        parser.add_argument('--likes', type=int, default=10000000)
+        parser.add_argument('--follows', type=int, default=1000000)
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель Ципфа для выбора авторов и постов.'
+        )
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        self.skew = options['skew']
+        users = self.seeded_users
+        with explicit_pub_date(Follow, Like):
+            self.create_follows(users, options['follows'])
+            self.create_likes(users, options['likes'])
+        call_command('recount_counters', batch_size=self.batch_size,
+                     stdout=self.stdout)
+        self.create_feeds(users)
+        call_command('rebuild_search_index', stdout=self.stdout)
+
+    def create_users(self, prefix, count):
+        self.seeded_users = super().create_users(prefix, count)
+        return self.seeded_users
+
+    def insert_unique(self, model, total, make):
+        """Как insert, но повторы пар отбрасывает уникальное ограничение,
+        поэтому строк может оказаться немного меньше total."""
+        created = 0
+        while created < total:
+            size = min(self.batch_size, total - created)
+            model.objects.bulk_create(
+                [make() for _ in range(size)], ignore_conflicts=True
+            )
+            created += size
+            self.stdout.write(f'{model.__name__}: {created}/{total}')
+        return created
+
+    def create_follows(self, users, count):
+        if len(users) < 2:
+            return 0
+        # Популярность авторов - случайная перестановка, чтобы звездами
+        # оказались не первые созданные пользователи.
+        authors = users[:]
+        self.random.shuffle(authors)
+        weights = zipf_weights(len(authors), self.skew)
+
+        def make():
+            user_id = self.random.choice(users)
+            while True:
+                author_id = self.random.choices(
+                    authors, cum_weights=weights
+                )[0]
+                if author_id != user_id:
+                    return Follow(user_id=user_id, author_id=author_id,
+                                  pub_date=self.random_date())
+
+        return self.insert_unique(Follow, count, make)
+
+    def create_likes(self, users, count):
+        # Свежие посты популярнее старых.
+        posts = list(Post.objects.order_by('-pub_date').values_list(
+            'pk', flat=True
+        ))
+        if not posts:
+            return 0
+        weights = zipf_weights(len(posts), self.skew)
+        return self.insert_unique(Like, count, lambda: Like(
+            user_id=self.random.choice(users),
+            post_id=self.random.choices(posts, cum_weights=weights)[0],
+            pub_date=self.random_date(),
+        ))
+
+    def create_feeds(self, users):
+        """Ленты подписчиков, как их разложил бы fan_out при публикации:
+        bulk_create постов и подписок сигналов не шлет."""
+        created = 0
+        for start in range(0, len(users), USERS_PER_QUERY):
+            rows = Follow.objects.filter(
+                user_id__in=users[start:start + USERS_PER_QUERY],
+                author__profile__followers_count__lte=(
+                    settings.FEED_FANOUT_LIMIT
+                ),
+                author__posts__isnull=False,
+            ).values_list(
+                'user_id', 'author__posts__pk', 'author__posts__pub_date'
+            )
+            entries = [
+                FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+                for user_id, post_id, pub_date in rows
+            ]
+            FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+            created += len(entries)
+            self.stdout.write(f'FeedEntry: {created}')
+        return created
@@ -0,0 +1,57 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase
+
+from posts.models import FeedEntry, Follow, Like, Post
+
+
+class BenchmarkCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('seed_benchmark', users=10, posts=40, comments=10,
+                     likes=60, follows=20, groups=2, batch_size=16,
+                     stdout=StringIO())
+
+    def run_benchmarks(self, **options):
+        stdout = StringIO()
+        call_command('run_benchmarks', runs=2, warmup=1, stdout=stdout,
+                     stderr=StringIO(), **options)
+        return stdout.getvalue()
+
+    def test_seed_volumes(self):
+        """Лайки и подписки засеяны без дублей и самоподписок, счетчики
+        пересчитаны, ленты разложены."""
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertTrue(0 < Like.objects.count() <= 60)
+        self.assertTrue(0 < Follow.objects.count() <= 20)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertEqual(
+            sum(Post.objects.values_list('likes_count', flat=True)),
+            Like.objects.count()
+        )
+        self.assertTrue(FeedEntry.objects.exists())
+
+    def test_results_and_baseline(self):
+        """Результат - JSON по всем сценариям, записи откатываются; рост
+        числа запросов относительно базовой линии - регрессия."""
+        likes = Like.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = Path(directory, 'baseline.json')
+            report = json.loads(self.run_benchmarks(baseline=baseline))
+            self.assertEqual(set(report['results']), {
+                'index', 'index_anonymous', 'group_list', 'profile',
+                'post_detail', 'follow_index', 'search', 'like', 'unlike',
+                'comment',
+            })
+            self.assertEqual(Like.objects.count(), likes)
+            self.assertEqual(report['meta']['rows']['Like'], likes)
+            report['results']['index']['queries'] -= 1
+            baseline.write_text(json.dumps(report))
+            with self.assertRaises(CommandError):
+                self.run_benchmarks(baseline=baseline)
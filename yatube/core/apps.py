@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+
+        from .db import apply_sqlite_pragmas, check_connections
+
+        connection_created.connect(apply_sqlite_pragmas)
+        if settings.DB_HEALTH_CHECKS:
+            request_started.connect(check_connections)
@@ -0,0 +1,92 @@
+"""Бэкенды кеша со счетчиками попаданий и промахов.
+
+Это обычные бэкенды Django, которые дополнительно считают попадания и
+промахи по пространству имен (KEY_PREFIX). Счетчики живут в памяти
+процесса и отдаются эндпоинтом core:cache_stats для мониторинга.
+"""
+import threading
+from collections import Counter, defaultdict
+
+from django.core.cache.backends.base import BaseCache
+from django.core.cache.backends.filebased import (
+    FileBasedCache as DjangoFileBasedCache
+)
+from django.core.cache.backends.locmem import LocMemCache as DjangoLocMemCache
+from django.core.cache.backends.memcached import (
+    MemcachedCache as DjangoMemcachedCache
+)
+
+_lock = threading.Lock()
+_stats = defaultdict(Counter)
+_missing = object()
+
+
+def record(namespace, hits=0, misses=0):
+    with _lock:
+        _stats[namespace]['hits'] += hits
+        _stats[namespace]['misses'] += misses
+
+
+def get_stats():
+    with _lock:
+        return {
+            namespace: {
+                'hits': counter['hits'],
+                'misses': counter['misses'],
+                'hit_ratio': round(
+                    counter['hits']
+                    / ((counter['hits'] + counter['misses']) or 1), 4
+                ),
+            }
+            for namespace, counter in _stats.items()
+        }
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
+
+
+class StatsMixin:
+    @property
+    def namespace(self):
+        return self.key_prefix or 'default'
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version=version)
+        if value is _missing:
+            record(self.namespace, misses=1)
+            return default
+        record(self.namespace, hits=1)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version=version)
+        # Базовый get_many сам вызывает get(), там промахи уже посчитаны.
+        if super().get_many.__func__ is not BaseCache.get_many:
+            record(self.namespace, hits=len(values),
+                   misses=len(keys) - len(values))
+        return values
+
+
+class LocMemCache(StatsMixin, DjangoLocMemCache):
+    pass
+
+
+class FileBasedCache(StatsMixin, DjangoFileBasedCache):
+    pass
+
+
+class MemcachedCache(StatsMixin, DjangoMemcachedCache):
+    pass
+
+
+try:
+    from django_redis.cache import RedisCache as DjangoRedisCache
+except ImportError:
+    DjangoRedisCache = None
+
+if DjangoRedisCache is not None:
+    class RedisCache(StatsMixin, DjangoRedisCache):
+        pass
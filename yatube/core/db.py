@@ -0,0 +1,26 @@
+"""Настройка соединений с базой, которой нет в Django 2.2.
+
+PRAGMA для SQLite выполняются при каждом новом соединении, а проверка
+здоровья переиспользуемых соединений (аналог CONN_HEALTH_CHECKS из
+Django 4.1) - в начале каждого запроса.
+"""
+from django.conf import settings
+from django.db import connections
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def check_connections(**kwargs):
+    """Закрывает переиспользуемые соединения, которые перестали отвечать,
+    чтобы запрос открыл новое, а не упал на первом SQL."""
+    for connection in connections.all():
+        if (connection.connection is not None
+                and connection.settings_dict['CONN_MAX_AGE']
+                and not connection.is_usable()):
+            connection.close()
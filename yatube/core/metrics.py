@@ -0,0 +1,75 @@
+"""Метрики запросов по представлениям: число SQL-запросов, время в базе,
+время рендера шаблона и полное время ответа.
+
+Для каждого имени представления (posts:index, posts:post_detail, ...)
+хранится скользящее окно из METRICS_WINDOW последних замеров, по которому
+считаются перцентили. Как и счетчики кеша, метрики живут в памяти
+процесса и отдаются эндпоинтом core:view_metrics: при нескольких
+воркерах каждый ответ показывает замеры только ответившего процесса.
+Эндпоинт и заголовок Server-Timing видны только can_see_metrics.
+"""
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+
+FIELDS = ('queries', 'db_ms', 'template_ms', 'total_ms')
+
+_lock = threading.Lock()
+_windows = defaultdict(lambda: {
+    field: deque(maxlen=settings.METRICS_WINDOW) for field in FIELDS
+})
+
+
+def can_see_metrics(request):
+    """Метрики видны персоналу и запросам с INTERNAL_IPS."""
+    user = getattr(request, 'user', None)
+    return ((user is not None and user.is_staff)
+            or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS)
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу из отсортированного списка."""
+    return values[max(0, round(len(values) * share) - 1)]
+
+
+def summarize(samples):
+    values = sorted(samples)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'avg': round(sum(values) / len(values), 2),
+        'p50': round(percentile(values, 0.5), 2),
+        'p95': round(percentile(values, 0.95), 2),
+        'p99': round(percentile(values, 0.99), 2),
+        'max': round(values[-1], 2),
+    }
+
+
+def record(view_name, **sample):
+    with _lock:
+        window = _windows[view_name]
+        for field in FIELDS:
+            window[field].append(sample[field])
+
+
+def get_metrics():
+    with _lock:
+        windows = {
+            view_name: {
+                field: list(values) for field, values in window.items()
+            }
+            for view_name, window in _windows.items()
+        }
+    return {
+        view_name: {
+            field: summarize(values) for field, values in window.items()
+        }
+        for view_name, window in sorted(windows.items())
+    }
+
+
+def reset_metrics():
+    with _lock:
+        _windows.clear()
@@ -0,0 +1,104 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, routers
+
+logger = logging.getLogger(__name__)
+
+PIN_KEY = 'replica_pinned_until'
+
+
+class ReplicaPinMiddleware:
+    """Читает из основной базы, пока не истекла метка последней записи
+    пользователя, и ставит новую метку после запроса с записью."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        session = getattr(request, 'session', None)
+        pinned_until = session.get(PIN_KEY, 0) if session is not None else 0
+        tokens = routers.start_request(pinned=pinned_until > time.time())
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.finish_request(tokens)
+        if wrote and session is not None and settings.DATABASE_REPLICAS:
+            session[PIN_KEY] = time.time() + settings.REPLICA_PIN_SEC
+        return response
+
+
+class QueryTimer:
+    """execute_wrapper, который считает запросы и время в базе."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+class ViewMetricsMiddleware:
+    """Замеряет запросы к базе, рендер шаблона и полное время ответа.
+
+    Замеры попадают в core.metrics по имени представления, в заголовок
+    Server-Timing (если он включен и запрос проходит can_see_metrics:
+    тайминги базы не для посторонних), а при превышении бюджета запросов из
+    VIEW_QUERY_BUDGETS - в предупреждение лога. Должен стоять первым в
+    MIDDLEWARE, чтобы полное время включало остальные middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        timer = QueryTimer()
+        request._template_ms = 0.0
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = timer.seconds * 1000
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            metrics.record(
+                match.view_name, queries=timer.queries, db_ms=db_ms,
+                template_ms=request._template_ms, total_ms=total_ms,
+            )
+            budget = settings.VIEW_QUERY_BUDGETS.get(
+                match.view_name, settings.DEFAULT_QUERY_BUDGET
+            )
+            if timer.queries > budget:
+                logger.warning(
+                    '%s: %d SQL-запросов при бюджете %d (%s)',
+                    match.view_name, timer.queries, budget,
+                    request.get_full_path(),
+                )
+        if settings.SERVER_TIMING and metrics.can_see_metrics(request):
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={db_ms:.1f};desc="{timer.queries} SQL"',
+                f'tpl;dur={request._template_ms:.1f}',
+                f'total;dur={total_ms:.1f}',
+            ))
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._template_ms += (time.perf_counter() - started) * 1000
+
+        response.add_post_render_callback(rendered)
+        return response
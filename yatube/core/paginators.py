@@ -0,0 +1,98 @@
+import base64
+import binascii
+import hashlib
+import json
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPaginator:
+    """Пагинатор по ключу (pub_date, pk) без OFFSET и COUNT(*).
+
+    Страница выбирается условием WHERE по последнему показанному посту,
+    поэтому глубокие страницы читаются так же быстро, как первая. Общее
+    число записей приблизительное: считается один раз и кешируется.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, date_field='pub_date'):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.date_field = date_field
+
+    @cached_property
+    def count(self):
+        query = str(self.object_list.order_by().query).encode()
+        key = 'paginator:count:' + hashlib.md5(query).hexdigest()
+        return cache.get_or_set(
+            key, self.object_list.count, settings.COUNT_CACHE_SEC
+        )
+
+    def page(self, cursor=None):
+        queryset = self.object_list.order_by(f'-{self.date_field}', '-pk')
+        if cursor:
+            date, pk = self.decode(cursor)
+            queryset = queryset.filter(
+                Q(**{f'{self.date_field}__lt': date})
+                | Q(**{self.date_field: date, 'pk__lt': pk})
+            )
+        object_list = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[:self.per_page]
+            next_cursor = self.encode(object_list[-1])
+        return CursorPage(object_list, self, bool(cursor), next_cursor)
+
+    def encode(self, obj):
+        value = json.dumps(
+            [getattr(obj, self.date_field).isoformat(), obj.pk]
+        )
+        return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            date, pk = json.loads(base64.urlsafe_b64decode(padded))
+            date = parse_datetime(date)
+            pk = int(pk)
+        except (binascii.Error, TypeError, ValueError):
+            raise InvalidCursor('Неверный курсор страницы')
+        if date is None:
+            raise InvalidCursor('Неверный курсор страницы')
+        return date, pk
+
+
+class CursorPage(Sequence):
+    def __init__(self, object_list, paginator, has_previous, next_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
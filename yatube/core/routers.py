@@ -0,0 +1,51 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в DATABASE_REPLICAS. После записи пользователь еще
+REPLICA_PIN_SEC секунд читает из основной базы (метку в сессии ставит
+ReplicaPinMiddleware), чтобы сразу увидеть свой пост или комментарий,
+пока реплика догоняет. В пределах запроса или потока чтение после
+записи тоже идет в основную базу.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Приложения, которые всегда читаются из основной базы: сессия, только
+# что созданная при входе, могла еще не доехать до реплики.
+PRIMARY_APPS = {'sessions'}
+
+_pinned = ContextVar('replica_pinned', default=False)
+_wrote = ContextVar('replica_wrote', default=False)
+
+
+def start_request(pinned):
+    """Сбрасывает состояние потока в начале запроса: потоки сервера
+    переиспользуются между запросами."""
+    return _pinned.set(pinned), _wrote.set(False)
+
+
+def finish_request(tokens):
+    """Возвращает, была ли в запросе запись, и восстанавливает состояние."""
+    wrote = _wrote.get()
+    pinned_token, wrote_token = tokens
+    _pinned.reset(pinned_token)
+    _wrote.reset(wrote_token)
+    return wrote
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (not settings.DATABASE_REPLICAS or _pinned.get()
+                or model._meta.app_label in PRIMARY_APPS):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        _pinned.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -0,0 +1,191 @@
+import contextvars
+import time
+from unittest import skipUnless
+
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from . import routers
+from .cache import get_stats, reset_stats
+from .db import apply_sqlite_pragmas
+from .metrics import reset_metrics
+from .middleware import PIN_KEY, ReplicaPinMiddleware
+from .routers import ReplicaRouter
+
+
+class CacheStatsTest(TestCase):
+    def setUp(self):
+        caches['posts'].clear()
+        reset_stats()
+
+    def test_hits_and_misses_by_namespace(self):
+        """Попадания и промахи считаются отдельно для каждого приложения."""
+        posts = caches['posts']
+        posts.set('key', 'value')
+        posts.get('key')
+        posts.get('absent')
+        posts.get_many(['key', 'absent'])
+        caches['default'].get('key')
+        stats = get_stats()
+        self.assertEqual(stats['posts']['hits'], 2)
+        self.assertEqual(stats['posts']['misses'], 2)
+        self.assertEqual(stats['yatube'], {
+            'hits': 0, 'misses': 1, 'hit_ratio': 0.0
+        })
+
+    def test_namespaces_do_not_collide(self):
+        """Ключи и очистка одного кеша не задевают другой."""
+        caches['posts'].set('key', 'posts')
+        self.assertIsNone(caches['default'].get('key'))
+        caches['default'].clear()
+        self.assertEqual(caches['posts'].get('key'), 'posts')
+
+    def test_cache_stats_endpoint(self):
+        caches['posts'].get('absent')
+        response = Client().get(reverse('core:cache_stats'))
+        self.assertEqual(response.json()['posts']['misses'], 1)
+        with override_settings(INTERNAL_IPS=[]):
+            response = Client().get(reverse('core:cache_stats'))
+        self.assertEqual(response.status_code, 403)
+
+
+class ViewMetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='metrics')
+        Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        reset_metrics()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_metrics_by_view(self):
+        """Запрос попадает в метрики своего представления и в
+        Server-Timing."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ SQL", tpl;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+        metrics = self.client.get(reverse('core:view_metrics')).json()
+        index = metrics['posts:index']
+        self.assertEqual(index['total_ms']['count'], 1)
+        self.assertGreater(index['queries']['max'], 0)
+        self.assertGreater(index['template_ms']['max'], 0)
+        with override_settings(INTERNAL_IPS=[]):
+            response = Client().get(reverse('core:view_metrics'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_server_timing_hidden(self):
+        """Server-Timing выключен по умолчанию и не виден посторонним."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        with override_settings(SERVER_TIMING=True, INTERNAL_IPS=[]):
+            response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(VIEW_QUERY_BUDGETS={'posts:index': 1})
+    def test_query_budget_warning(self):
+        """Превышение бюджета запросов пишется в лог."""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+
+
+class DatabaseSetupTest(TestCase):
+    @skipUnless(connection.vendor == 'sqlite', 'PRAGMA есть только в SQLite')
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234})
+    def test_sqlite_pragmas(self):
+        """PRAGMA из настроек выполняются на новом соединении."""
+        apply_sqlite_pragmas(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 1234)
+
+
+REPLICA = 'replica_test'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRouterTest(TestCase):
+    """Реплика - отдельная база SQLite в памяти со своим постом, поэтому по
+    прочитанным строкам видно, из какой базы они пришли.
+
+    Каждый тест выполняется в своем контексте, чтобы записи фикстур в
+    этом потоке не привязали чтение к основной базе.
+    """
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:',
+        }
+        with connections[REPLICA].schema_editor() as editor:
+            for model in (User, Group, Post):
+                editor.create_model(model)
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='primary')
+        Post.objects.create(text='Из основной', author=cls.user)
+        # bulk_create без сигналов: их обработчики пишут в основную базу.
+        User.objects.using(REPLICA).bulk_create(
+            [User(pk=cls.user.pk, username='primary')]
+        )
+        Post.objects.using(REPLICA).bulk_create(
+            [Post(text='С реплики', author_id=cls.user.pk)]
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+
+    def run(self, result=None):
+        return contextvars.copy_context().run(super().run, result)
+
+    def texts(self):
+        return sorted(Post.objects.values_list('text', flat=True))
+
+    def test_reads_go_to_replica_until_write(self):
+        router = ReplicaRouter()
+        tokens = routers.start_request(pinned=False)
+        self.assertEqual(self.texts(), ['С реплики'])
+        self.assertEqual(router.db_for_read(Session), 'default')
+        Post.objects.create(text='Новый', author=self.user)
+        self.assertEqual(self.texts(), ['Из основной', 'Новый'])
+        self.assertTrue(routers.finish_request(tokens))
+
+    def test_reads_pinned_after_own_write(self):
+        """После запроса с записью сессия читает из основной базы."""
+        reads = []
+
+        def write(request):
+            Post.objects.create(text='Новый', author=self.user)
+            return HttpResponse()
+
+        def read(request):
+            reads.append(self.texts())
+            return HttpResponse()
+
+        request = RequestFactory().post('/')
+        request.session = {}
+        ReplicaPinMiddleware(write)(request)
+        self.assertIn(PIN_KEY, request.session)
+        request = RequestFactory().get('/')
+        request.session = {PIN_KEY: time.time() + 5}
+        ReplicaPinMiddleware(read)(request)
+        request.session = {PIN_KEY: time.time() - 1}
+        ReplicaPinMiddleware(read)(request)
+        self.assertEqual(
+            reads, [['Из основной', 'Новый'], ['С реплики']]
+        )
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import (
+    StopUpload, TemporaryFileUploadHandler,
+)
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл и обрывает разбор запроса, как
+    только файл превысит FILE_UPLOAD_MAX_BYTES: остаток тела не читается.
+
+    Вместо оборванного файла остается пустая заглушка aborted с
+    truncated, по которой валидатор формы отклоняет файл.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.aborted = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.FILE_UPLOAD_MAX_BYTES:
+            self.aborted = SimpleUploadedFile(
+                self.file_name, b'', self.content_type
+            )
+            self.aborted.truncated = True
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+class LimitedUploadMixin:
+    """Ставит LimitedUploadHandler обработчиком загрузок представления.
+
+    Обработчики нельзя сменить после разбора тела, а CsrfViewMiddleware
+    читает POST до представления, поэтому проверка CSRF переносится
+    внутрь dispatch, как советует документация Django.
+    """
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        handler = LimitedUploadHandler(request)
+        request.upload_handlers = [handler]
+        return csrf_protect(self.limited_dispatch)(
+            request, handler, *args, **kwargs
+        )
+
+    def limited_dispatch(self, request, handler, *args, **kwargs):
+        if request.method == 'POST':
+            files = request.FILES  # разбор тела, если CSRF его не начал
+            if handler.aborted:
+                files.appendlist(handler.field_name, handler.aborted)
+        return super().dispatch(request, *args, **kwargs)
@@ -1,4 +1,11 @@
+from django.conf import settings
+from django.http import HttpResponseForbidden, JsonResponse
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+
+from .cache import get_stats
+from .metrics import can_see_metrics, get_metrics
 
 
 def page_not_found(request, exception):
@@ -15,3 +22,30 @@ def bad_request(request, reason=''):
     return render(
         request, 'core/500.html', {'path': request.path}, status=500
     )
+
+
+def cache_stats(request):
+    """Попадания и промахи кеша по пространствам имен для мониторинга."""
+    if not can_see_metrics(request):
+        return HttpResponseForbidden()
+    return JsonResponse(get_stats())
+
+
+def view_metrics(request):
+    """Перцентили запросов к базе и времени ответа по представлениям."""
+    if not can_see_metrics(request):
+        return HttpResponseForbidden()
+    return JsonResponse(get_metrics())
+
+
+def serve_immutable(request, path, document_root=None):
+    """Отдача файлов с хешем в имени с кешированием на год (для DEBUG).
+
+    В продакшене те же заголовки для IMAGE_VARIANTS_DIR ставит веб-сервер.
+    """
+    response = serve(request, path, document_root=document_root)
+    patch_cache_control(
+        response, public=True, immutable=True,
+        max_age=settings.IMAGE_VARIANTS_MAX_AGE
+    )
+    return response
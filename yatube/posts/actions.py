@@ -0,0 +1,133 @@
+"""Изменения постов, лайков, подписок и комментариев вместе со счетчиками.
+
+Общие для HTML-страниц и API: каждое действие выполняется в одной
+транзакции с обновлением денормализованных счетчиков и сдвигает версию
+закешированной карточки поста.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from users.models import Profile
+from . import feed, thumbnails
+from .caching import bump_card_version, touch_pages, touch_post
+from .models import Follow, Like, Post
+
+
+def change_counter(queryset, field, delta):
+    """Сдвигает денормализованный счетчик на delta одним UPDATE."""
+    if not delta:
+        return
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def create_once(model, **fields):
+    """Вставляет строку, если ее еще нет, и сообщает, вставлена ли она.
+
+    Сначала INSERT, дубль отсекает уникальное ограничение: в SQLite
+    транзакция, начатая чтением, не дожидается блокировки на запись и
+    сразу падает с database is locked.
+    """
+    try:
+        with transaction.atomic():
+            model.objects.create(**fields)
+    except IntegrityError:
+        return False
+    return True
+
+
+def save_new_post(form, author):
+    """Сохраняет пост из формы и учитывает его в профиле автора."""
+    with transaction.atomic():
+        obj = form.save(commit=False)
+        obj.author = author
+        obj.save()
+        change_counter(
+            Profile.objects.filter(user=author), 'posts_count', 1
+        )
+        if 'image' in form.changed_data:
+            thumbnails.schedule(obj.image)
+    return obj
+
+
+def delete_post(post):
+    with transaction.atomic():
+        post.delete()
+        change_counter(
+            Profile.objects.filter(user=post.author_id), 'posts_count', -1
+        )
+
+
+def like(user, post):
+    """Ставит лайк; False, если он уже стоял."""
+    with transaction.atomic():
+        created = create_once(Like, user=user, post=post)
+        change_counter(
+            Post.objects.filter(pk=post.pk), 'likes_count', int(created)
+        )
+    if created:
+        bump_card_version(post.pk)
+        touch_post(post)
+    return created
+
+
+def unlike(user, post):
+    """Снимает лайк; False, если его не было."""
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(user=user, post=post).delete()
+        change_counter(
+            Post.objects.filter(pk=post.pk), 'likes_count', -deleted
+        )
+    if deleted:
+        bump_card_version(post.pk)
+        touch_post(post)
+    return bool(deleted)
+
+
+def follow(user, author):
+    """Подписывает user на author; False, если подписка уже была или это
+    сам автор."""
+    if user == author:
+        return False
+    with transaction.atomic():
+        created = create_once(Follow, user=user, author=author)
+        change_counter(
+            Profile.objects.filter(user=author), 'followers_count',
+            int(created)
+        )
+    if created:
+        touch_pages(f'author:{author.pk}', f'author:{user.pk}')
+    return created
+
+
+def unfollow(user, author):
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+        profile = Profile.objects.select_for_update().filter(user=author)
+        was = profile.values_list('followers_count', flat=True).first()
+        change_counter(profile, 'followers_count', -deleted)
+    if deleted:
+        touch_pages(f'author:{author.pk}', f'author:{user.pk}')
+        feed.unfollowed(author.pk, was)
+    return bool(deleted)
+
+
+def add_comment(comment):
+    with transaction.atomic():
+        comment.save()
+        change_counter(
+            Post.objects.filter(pk=comment.post_id), 'comments_count', 1
+        )
+    bump_card_version(comment.post_id)
+    touch_post(comment.post)
+
+
+def delete_comment(comment):
+    with transaction.atomic():
+        comment.delete()
+        change_counter(
+            Post.objects.filter(pk=comment.post_id), 'comments_count', -1
+        )
+    bump_card_version(comment.post_id)
+    touch_post(comment.post)
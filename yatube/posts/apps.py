@@ -5,3 +5,6 @@ class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
     verbose_name = 'посты'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,177 @@
+"""Кеш отрендеренных карточек постов.
+
+Общая для всех зрителей часть карточки (шапка, картинка, видео, текст)
+кешируется тегом {% cache %} в posts_form.html по ключу из id поста и его
+версии. Версия хранится в кеше и сдвигается при любом изменении поста,
+поэтому старые фрагменты просто перестают читаться и вытесняются сами.
+
+Там же лежат отметки времени изменений страниц по областям: 'index' -
+главная, 'group:<id>' - лента группы, 'profile:<id>' - посты автора в
+профиле, 'post:<id>' - страница поста, 'author:<id>' - подписчики
+автора в профиле и на страницах его постов, ALL_PAGES - все страницы
+сразу (массовые команды). Изменение поста сдвигает только области
+страниц, на которых он показан (post_scopes). По отметкам страницы для
+анонимов отдают ETag и Last-Modified без запросов к постам, и по ним же
+устаревают целиком закешированные страницы для анонимов (cached_page).
+"""
+import hashlib
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.template.response import SimpleTemplateResponse
+
+from .models import Post
+
+cache = caches['posts']
+
+CARD_VERSION_KEY = 'posts:card_version:{}'
+CHANGED_KEY = 'posts:changed:{}'
+AUTHOR_KEY = 'posts:author:{}'
+PAGE_KEY = 'posts:page:{}'
+PAGE_LOCK_KEY = 'posts:page_lock:{}'
+PAGE_WAIT_STEP_SEC = 0.05
+ALL_PAGES = 'all'
+
+
+def bump_card_version(post_id):
+    key = CARD_VERSION_KEY.format(post_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def attach_card_versions(posts):
+    """Проставляет card_version всем постам страницы одним get_many.
+
+    Если версия вытеснена из кеша, вместо нее берется текущее время, чтобы
+    не совпасть со старыми фрагментами, которые еще могут лежать в кеше.
+    """
+    keys = {CARD_VERSION_KEY.format(post.pk): post for post in posts}
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    for key, post in keys.items():
+        post.card_version = versions[key]
+
+
+def now_and_on_commit(func):
+    """Выполняет func сразу и, если открыта транзакция, еще раз после ее
+    коммита. Без второго вызова запрос, успевший прочитать старые строки
+    до коммита, сохранил бы их в кеш под уже новой отметкой, и они жили
+    бы там до следующего изменения."""
+    func()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(func)
+
+
+def touch_pages(*scopes):
+    """Отмечает, что страницы областей scopes изменились."""
+    def touch():
+        now = time.time_ns()
+        cache.set_many(
+            {CHANGED_KEY.format(scope): now for scope in scopes}, None
+        )
+
+    now_and_on_commit(touch)
+
+
+def post_scopes(post):
+    """Области страниц, на которых показан пост."""
+    scopes = ['index', f'post:{post.pk}', f'profile:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
+
+
+def touch_post(post):
+    touch_pages(*post_scopes(post))
+
+
+def last_changed(*scopes):
+    """Время последнего изменения областей и ALL_PAGES в наносекундах.
+
+    Вытесненная отметка заменяется текущим временем: страница будет
+    отдана заново, но не окажется старее, чем есть.
+    """
+    keys = [CHANGED_KEY.format(scope) for scope in (ALL_PAGES, *scopes)]
+    stamps = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in stamps}
+    if missing:
+        cache.set_many(missing, None)
+        stamps.update(missing)
+    return max(stamps.values())
+
+
+def post_author_id(post_id):
+    """id автора поста; хранится в кеше бессрочно, автор поста не меняется.
+
+    Для несуществующего поста - Post.DoesNotExist.
+    """
+    key = AUTHOR_KEY.format(post_id)
+    author_id = cache.get(key)
+    if author_id is None:
+        author_id = Post.objects.values_list(
+            'author_id', flat=True
+        ).get(pk=post_id)
+        cache.set(key, author_id, None)
+    return author_id
+
+
+def expires_early(entry):
+    """Вероятностное досрочное обновление (XFetch): чем дольше рендер и
+    ближе истечение, тем вероятнее, что запрос обновит копию заранее."""
+    gap = -entry['delta'] * math.log(1 - random.random())
+    return time.time() + gap >= entry['expires']
+
+
+def cached_page(url, stamp, render):
+    """Ответ страницы для анонимов из кеша и отметка, по которой он собран.
+
+    Копия подходит, пока ее отметка совпадает со stamp и не подошел срок
+    ANON_PAGE_CACHE_SEC. Рендерит только запрос, взявший блокировку;
+    остальные в это время получают прежнюю копию, а если ее нет - ждут
+    до PAGE_RENDER_WAIT_SEC и только потом рендерят сами.
+    """
+    ttl = settings.ANON_PAGE_CACHE_SEC
+    if not ttl:
+        return stamp, render()
+    digest = hashlib.md5(url.encode()).hexdigest()
+    key = PAGE_KEY.format(digest)
+    lock_key = PAGE_LOCK_KEY.format(digest)
+    entry = cache.get(key)
+    if entry and entry['stamp'] == stamp and not expires_early(entry):
+        return entry['stamp'], entry['response']
+    if not cache.add(lock_key, True, settings.PAGE_RENDER_LOCK_SEC):
+        if entry:
+            return entry['stamp'], entry['response']
+        deadline = time.monotonic() + settings.PAGE_RENDER_WAIT_SEC
+        while time.monotonic() < deadline:
+            time.sleep(PAGE_WAIT_STEP_SEC)
+            entry = cache.get(key)
+            if entry and entry['stamp'] == stamp:
+                return entry['stamp'], entry['response']
+        return stamp, render()
+    try:
+        started = time.monotonic()
+        response = render()
+        if isinstance(response, SimpleTemplateResponse):
+            response.render()
+        if response.status_code == 200:
+            # Копия живет дольше срока свежести, чтобы было что отдать,
+            # пока ее обновляет другой запрос.
+            cache.set(key, {
+                'stamp': stamp,
+                'response': response,
+                'expires': time.time() + ttl,
+                'delta': time.monotonic() - started,
+            }, ttl * 2)
+    finally:
+        cache.delete(lock_key)
+    return stamp, response
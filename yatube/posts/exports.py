@@ -0,0 +1,154 @@
+"""Потоковая выгрузка постов, комментариев, лайков и подписок.
+
+Записи читаются через iterator(chunk_size=...) и сразу превращаются в
+строки JSONL, поэтому память не зависит от объема базы. Поля записей те
+же, что принимает import_posts, так что полную выгрузку можно загрузить
+обратно; картинки переносятся отдельно архивом медиа. В выгрузке одного
+пользователя есть его лайки и комментарии к чужим постам, при загрузке
+такие записи без своих постов пропускаются.
+Медиа пакуется в zip, который пишется по кускам и отдается по мере
+готовности: ZipFile умеет писать в поток без seek.
+"""
+import json
+from datetime import datetime
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Comment, Follow, Like, Post
+
+CHUNK_SIZE = 2000
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """Даты с микросекундами: DjangoJSONEncoder обрезает их до
+    миллисекунд, и выгрузка перестает совпадать с базой."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+# Поля записей каждого вида: ключ в JSONL -> поле модели.
+FIELDS = {
+    'posts': {
+        'id': 'id', 'text': 'text', 'author': 'author__username',
+        'group': 'group__slug', 'pub_date': 'pub_date', 'image': 'image',
+        'video': 'video',
+    },
+    'comments': {
+        'id': 'id', 'post': 'post', 'author': 'author__username',
+        'text': 'text', 'pub_date': 'pub_date',
+    },
+    'likes': {'user': 'user__username', 'post': 'post',
+              'pub_date': 'pub_date'},
+    'follows': {'user': 'user__username', 'author': 'author__username',
+                'pub_date': 'pub_date'},
+}
+
+
+def querysets(user=None):
+    """Пары (вид, queryset) в порядке, в котором их загружает import_posts:
+    посты раньше ссылающихся на них комментариев и лайков."""
+    posts = Post.objects.all()
+    comments = Comment.objects.all()
+    likes = Like.objects.all()
+    follows = Follow.objects.all()
+    if user is not None:
+        posts = posts.filter(author=user)
+        comments = comments.filter(author=user)
+        likes = likes.filter(user=user)
+        follows = follows.filter(user=user)
+    return tuple(
+        (kind, queryset.order_by('pk').values_list(*FIELDS[kind].values()))
+        for kind, queryset in (('posts', posts), ('comments', comments),
+                               ('likes', likes), ('follows', follows))
+    )
+
+
+def lines(kind, queryset, chunk_size=CHUNK_SIZE, with_kind=False):
+    """Строки JSONL по кортежам queryset из querysets(); with_kind
+    добавляет вид в поле kind каждой записи."""
+    keys = tuple(FIELDS[kind])
+    for row in queryset.iterator(chunk_size=chunk_size):
+        record = dict(zip(keys, row))
+        if with_kind:
+            record = {'kind': kind, **record}
+        yield json.dumps(record, cls=ExportEncoder,
+                         ensure_ascii=False) + '\n'
+
+
+def user_lines(user, chunk_size=CHUNK_SIZE):
+    """Все данные пользователя одним потоком, вид записи - в поле kind."""
+    for kind, queryset in querysets(user):
+        yield from lines(kind, queryset, chunk_size, with_kind=True)
+
+
+def media_names(user=None, chunk_size=CHUNK_SIZE):
+    posts = Post.objects.exclude(image='').order_by('pk')
+    if user is not None:
+        posts = posts.filter(author=user)
+    return posts.values_list('image', flat=True).iterator(
+        chunk_size=chunk_size
+    )
+
+
+def media_files(names):
+    """Пары (имя в архиве, куски файла) для файлов из хранилища;
+    пропавшие файлы пропускаются."""
+    for name in names:
+        if default_storage.exists(name):
+            yield f'media/{name}', storage_chunks(name)
+
+
+def storage_chunks(name):
+    with default_storage.open(name) as file:
+        yield from file.chunks()
+
+
+class ZipBuffer:
+    """Файловый объект без seek, копящий записанное до забора."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def zip_stream(files):
+    """Отдает zip по кускам. files - пары (имя в архиве, итератор байтов
+    или строк); JSONL сжимается, медиа хранится как есть: картинки уже
+    сжаты."""
+    return filter(None, zip_parts(files))
+
+
+def zip_parts(files):
+    buffer = ZipBuffer()
+    date_time = timezone.localtime().timetuple()[:6]
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, chunks in files:
+            info = zipfile.ZipInfo(name, date_time)
+            info.compress_type = (zipfile.ZIP_DEFLATED
+                                  if name.endswith('.jsonl')
+                                  else zipfile.ZIP_STORED)
+            with archive.open(info, 'w', force_zip64=True) as dest:
+                for chunk in chunks:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    dest.write(chunk)
+                    yield buffer.take()
+            yield buffer.take()
+    yield buffer.take()
@@ -0,0 +1,136 @@
+"""Лента подписок с раскладкой постов при публикации (fan-out-on-write).
+
+Для обычных авторов пост при создании копируется в ленты всех подписчиков,
+и /follow/ читает готовую ленту одним диапазоном по индексу (user, pub_date).
+Посты авторов, у которых подписчиков больше FEED_FANOUT_LIMIT, не
+раскладываются: такие авторы подмешиваются в ленту при чтении. Когда
+автор опускается обратно до лимита, пропущенное за это время досылается
+в ленты (catch_up).
+"""
+import itertools
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from users.models import Profile
+from .models import FeedEntry, Follow, Post
+
+BATCH_SIZE = 1000
+
+
+def is_celebrity(author_id):
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts],
+        ignore_conflicts=True,
+    )
+
+
+def catch_up(author_id):
+    """Досылает в ленты то, что не раскладывалось, пока у автора было
+    больше FEED_FANOUT_LIMIT подписчиков: его посты без записей в лентах
+    всем подписчикам и последние посты тем, кто подписался за это время.
+    Объем работы равен пропущенному, а не числу подписчиков."""
+    posts = list(Post.objects.filter(
+        author_id=author_id, feed_entries__isnull=True
+    ).values_list('pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE])
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    entries = (
+        FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for user_id in followers.iterator() for pk, pub_date in posts
+    )
+    while posts:
+        batch = list(itertools.islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+    unfed = followers.exclude(user_id__in=FeedEntry.objects.filter(
+        post__author_id=author_id
+    ).values('user_id'))
+    for user_id in list(unfed):
+        backfill(user_id, author_id)
+
+
+def refill(author_ids):
+    """Догоняет ленты после загрузки постов и подписок в обход сигналов
+    (import_posts). Счетчики подписчиков к этому времени еще не
+    пересчитаны, поэтому лимит проверяется по самим подпискам."""
+    author_ids = list(author_ids)
+    for start in range(0, len(author_ids), BATCH_SIZE):
+        authors = Follow.objects.filter(
+            author_id__in=author_ids[start:start + BATCH_SIZE]
+        ).values('author_id').annotate(followers=Count('pk')).filter(
+            followers__lte=settings.FEED_FANOUT_LIMIT
+        ).values_list('author_id', flat=True)
+        for author_id in list(authors):
+            catch_up(author_id)
+
+
+def unfollowed(author_id, was):
+    """После отписки: автор, у которого было больше лимита подписчиков, а
+    стало не больше, снова раскладывает посты при публикации, и его ленты
+    догоняются. Проверяется переход через лимит, а не равенство ему:
+    счетчик мог перескочить лимит после пересчета."""
+    if was is None or was <= settings.FEED_FANOUT_LIMIT:
+        return
+    if Profile.objects.filter(
+        user_id=author_id, followers_count__lte=settings.FEED_FANOUT_LIMIT
+    ).exists():
+        catch_up(author_id)
+
+
+def purge(user_id, author_id):
+    """Убирает посты автора из ленты после отписки."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def feed_posts(queryset, user):
+    """Сужает queryset постов до ленты подписок user.
+
+    Если среди подписок нет авторов сверх лимита, лента читается только из
+    FeedEntry, иначе к ней добавляются посты таких авторов.
+    """
+    celebrities = list(Profile.objects.filter(
+        user__following__user=user,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).values_list('user_id', flat=True))
+    if not celebrities:
+        return queryset.filter(
+            feed_entries__user=user
+        ).order_by('-feed_entries__pub_date')
+    entries = FeedEntry.objects.filter(user=user).values('post_id')
+    return queryset.filter(
+        Q(pk__in=entries) | Q(author_id__in=celebrities)
+    )
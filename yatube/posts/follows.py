@@ -0,0 +1,46 @@
+"""Подписки зрителя: на каких авторов он подписан.
+
+Множество id авторов читается одним запросом, хранится в кеше posts и
+запоминается на объекте пользователя до конца запроса, так что проверка
+"подписан ли зритель на автора" для любого числа авторов на странице
+стоит не больше одного запроса. Кеш сбрасывается сигналами Follow, в том
+числе после коммита транзакции.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from .caching import now_and_on_commit
+from .models import Follow
+
+cache = caches['posts']
+
+FOLLOWING_KEY = 'posts:following:{}'
+
+
+def following_ids(user):
+    """frozenset id авторов, на которых подписан user."""
+    if not user.is_authenticated:
+        return frozenset()
+    ids = getattr(user, '_following_ids', None)
+    if ids is None:
+        key = FOLLOWING_KEY.format(user.pk)
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(Follow.objects.filter(
+                user=user
+            ).values_list('author_id', flat=True))
+            cache.set(key, ids, settings.FOLLOWING_CACHE_SEC)
+        user._following_ids = ids
+    return ids
+
+
+def is_following(user, author):
+    return getattr(author, 'pk', author) in following_ids(user)
+
+
+def forget_following(user_id):
+    """Сбрасывает кеш подписок и повторяет сброс после коммита: иначе
+    параллельный запрос успел бы закешировать старое множество на
+    FOLLOWING_CACHE_SEC."""
+    key = FOLLOWING_KEY.format(user_id)
+    now_and_on_commit(lambda: cache.delete(key))
@@ -1,5 +1,6 @@
 from django import forms
 from .models import Post, Comment
+from .uploads import PostImageField
 
 
 class PostForm(forms.ModelForm):
@@ -12,6 +13,7 @@ class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image', 'video')
+        field_classes = {'image': PostImageField}
 
         def clean_subject(self):
             data = self.cleaned_data['video']
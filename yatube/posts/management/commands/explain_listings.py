@@ -0,0 +1,99 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+from posts.models import Comment, Post
+from posts.views import P_COUNT
+
+RUNS = 20
+# Составные индексы лент, без которых выполняется замер "до".
+LISTING_INDEXES = (
+    'post_group_pub_date_idx',
+    'post_author_pub_date_idx',
+    'comment_post_pub_date_idx',
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def busiest(queryset, field):
+    """Значение field, у которого больше всего строк."""
+    row = queryset.order_by().values(field).annotate(
+        total=Count('pk')
+    ).order_by('-total').first()
+    return row and row[field]
+
+
+class Command(BaseCommand):
+    help = ('Показывает EXPLAIN и время запросов ленты группы, профиля и '
+            'комментариев поста с составными индексами и без них.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs', type=int, default=RUNS,
+            help='Сколько раз выполнять каждый запрос.'
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='EXPLAIN ANALYZE, где база его поддерживает.'
+        )
+
+    def handle(self, *args, **options):
+        self.runs = options['runs']
+        self.explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            self.explain_options['analyze'] = True
+        queries = self.queries()
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for name in LISTING_INDEXES:
+                        cursor.execute(
+                            f'DROP INDEX {connection.ops.quote_name(name)}'
+                        )
+                self.report('Без индексов', queries)
+                raise Rollback
+        except Rollback:
+            pass
+        # Новое соединение, чтобы не брать планы из кеша подготовленных
+        # запросов sqlite3.
+        connection.close()
+        self.report('С индексами', queries)
+
+    def queries(self):
+        posts = Post.objects.for_list(AnonymousUser())
+        return {
+            'group_list': posts.filter(
+                group=busiest(Post.objects.exclude(group=None), 'group')
+            )[:P_COUNT],
+            'profile': posts.filter(
+                author=busiest(Post.objects, 'author')
+            )[:P_COUNT],
+            'comments': Comment.objects.filter(
+                post=busiest(Comment.objects, 'post')
+            ).select_related('author'),
+        }
+
+    def report(self, title, queries):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in queries.items():
+            plan = queryset.explain(**self.explain_options)
+            timings = []
+            for _ in range(self.runs):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[max(0, round(len(timings) * 0.95) - 1)]
+            self.stdout.write(self.style.SQL_TABLE(name))
+            self.stdout.write(plan)
+            self.stdout.write(
+                f'p50 {statistics.median(timings):.2f} мс, '
+                f'p95 {p95:.2f} мс\n'
+            )
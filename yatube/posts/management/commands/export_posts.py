@@ -0,0 +1,62 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exports import (
+    CHUNK_SIZE, lines, media_files, media_names, querysets, zip_stream,
+)
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты, комментарии, лайки и подписки в '
+            'posts.jsonl, comments.jsonl, likes.jsonl и follows.jsonl '
+            'каталога, которые принимает import_posts. Записи читаются '
+            'итератором, память не зависит от объема базы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для файлов.')
+        parser.add_argument('--user',
+                            help='Выгрузить только данные пользователя.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз.'
+        )
+        parser.add_argument(
+            '--media', metavar='ZIP',
+            help='Упаковать картинки постов в этот zip-архив.'
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя {options["user"]}.')
+        directory = Path(options['directory'])
+        directory.mkdir(parents=True, exist_ok=True)
+        chunk_size = options['chunk_size']
+        started = time.monotonic()
+        total = 0
+        for kind, queryset in querysets(user):
+            path = directory / f'{kind}.jsonl'
+            with open(path, 'w', encoding='utf-8') as file:
+                count = 0
+                for line in lines(kind, queryset, chunk_size):
+                    file.write(line)
+                    count += 1
+            self.stdout.write(f'{path}: {count}')
+            total += count
+        if options['media']:
+            with open(options['media'], 'wb') as file:
+                for chunk in zip_stream(
+                    media_files(media_names(user, chunk_size))
+                ):
+                    file.write(chunk)
+            self.stdout.write(f'Медиа: {options["media"]}')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено строк: {total} за {elapsed:.1f} с '
+            f'({total / (elapsed or 1):.0f} в секунду).'
+        ))
@@ -0,0 +1,284 @@
+import csv
+import itertools
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import feed
+from posts.caching import ALL_PAGES, touch_pages
+from posts.management.commands.seed_posts import explicit_pub_date
+from posts.models import Comment, Follow, Group, Like, Post, User
+from users.models import Profile
+
+BATCH_SIZE = 5000
+MAX_WARNINGS = 20  # сколько пропущенных строк показывать подробно
+FORMATS = {'.jsonl': 'jsonl', '.json': 'jsonl', '.csv': 'csv'}
+
+
+class RowError(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты, комментарии, лайки и подписки из JSONL или '
+            'CSV пачками bulk_create. Вид записей берется из --kind или '
+            'имени файла (posts.csv, likes.jsonl), авторы и группы '
+            'указываются username и slug. Посты и комментарии с полем id '
+            'сохраняются с этим id, на id поста ссылаются поля post '
+            'комментариев и лайков. Поле image - имя файла в хранилище '
+            'медиа, сами файлы копируются отдельно.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='+',
+            help='Файлы; посты загружаются раньше остальных видов.'
+        )
+        parser.add_argument('--kind', choices=self.kinds())
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько строк вставлять за одну транзакцию.'
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать пользователей, которых еще нет в базе.'
+        )
+
+    @staticmethod
+    def kinds():
+        return ('posts', 'comments', 'likes', 'follows')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.create_users = options['create_users']
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.warnings = 0
+        self.feed_authors = set()
+        started = time.monotonic()
+        total = 0
+        files = []
+        for path in map(Path, options['files']):
+            kind = options['kind'] or path.stem
+            if kind not in self.kinds():
+                raise CommandError(
+                    f'{path}: не понять, что в файле, укажите --kind.'
+                )
+            files.append((path, kind))
+        # Посты раньше ссылающихся на них комментариев и лайков.
+        files.sort(key=lambda file: self.kinds().index(file[1]))
+        with explicit_pub_date(Post, Comment, Like, Follow):
+            for path, kind in files:
+                total += self.import_file(
+                    path, kind, options['format'] or FORMATS.get(path.suffix)
+                )
+        self.reset_sequences()
+        # bulk_create не шлет сигналов, раскладывающих посты по лентам.
+        feed.refill(self.feed_authors)
+        touch_pages(ALL_PAGES)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано строк: {total} за {elapsed:.1f} с '
+            f'({total / (elapsed or 1):.0f} в секунду), ленты подписок '
+            f'заполнены. Счетчики и поисковый индекс обновят '
+            f'recount_counters и rebuild_search_index.'
+        ))
+
+    def read(self, path, fmt):
+        """Записи файла: словари строк CSV или еще не разобранные строки
+        JSONL, которые разбирает parse, чтобы битая строка пропускалась
+        как любая другая неверная запись."""
+        with open(path, encoding='utf-8', newline='') as file:
+            if fmt == 'csv':
+                for row in csv.DictReader(file):
+                    yield {key: value or None for key, value in row.items()}
+            elif fmt == 'jsonl':
+                for line in file:
+                    if line.strip():
+                        yield line
+            else:
+                raise CommandError(f'{path}: неизвестный формат, укажите '
+                                   f'--format.')
+
+    @staticmethod
+    def parse(raw):
+        if isinstance(raw, dict):
+            return raw
+        record = json.loads(raw)
+        if not isinstance(record, dict):
+            raise RowError('ожидается JSON-объект')
+        return record
+
+    def import_file(self, path, kind, fmt):
+        model, make = {
+            'posts': (Post, self.make_post),
+            'comments': (Comment, self.make_comment),
+            'likes': (Like, self.make_like),
+            'follows': (Follow, self.make_follow),
+        }[kind]
+        rows = self.read(path, fmt)
+        started = time.monotonic()
+        existed = model.objects.count()
+        sent = skipped = 0
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                break
+            start = sent + skipped + 1
+            records = []
+            for number, raw in enumerate(batch, start):
+                try:
+                    records.append((number, self.parse(raw)))
+                except (RowError, ValueError) as e:
+                    skipped += 1
+                    self.warn(f'{path}:{number}: {e!r}')
+            if self.create_users:
+                self.add_missing_users(record for _, record in records)
+            self.load_post_ids(record for _, record in records)
+            objs = []
+            for number, record in records:
+                try:
+                    objs.append(make(record))
+                except (RowError, KeyError, TypeError, ValueError) as e:
+                    skipped += 1
+                    self.warn(f'{path}:{number}: {e!r}')
+            with transaction.atomic():
+                model.objects.bulk_create(objs, ignore_conflicts=True)
+            sent += len(objs)
+            if model in (Post, Follow):
+                self.feed_authors.update(obj.author_id for obj in objs)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{kind}: отправлено {sent} ({sent / (elapsed or 1):.0f} '
+                f'в секунду), пропущено: {skipped}'
+            )
+        # ignore_conflicts молча отбрасывает дубли, поэтому вставленные
+        # строки считаются по таблице.
+        imported = model.objects.count() - existed
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{kind}: вставлено {imported} '
+            f'({imported / (elapsed or 1):.0f} в секунду), дублей: '
+            f'{sent - imported}, пропущено: {skipped}'
+        )
+        return imported
+
+    def warn(self, message):
+        self.warnings += 1
+        if self.warnings <= MAX_WARNINGS:
+            self.stderr.write(message)
+
+    def add_missing_users(self, records):
+        names = {
+            record[field] for record in records
+            for field in ('author', 'user') if record.get(field)
+        } - self.users.keys()
+        if not names:
+            return
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [User(username=name) for name in names], ignore_conflicts=True
+            )
+            created = dict(User.objects.filter(
+                username__in=names
+            ).values_list('username', 'pk'))
+            Profile.objects.bulk_create(
+                [Profile(user_id=pk) for pk in created.values()],
+                ignore_conflicts=True,
+            )
+        self.users.update(created)
+
+    def load_post_ids(self, records):
+        """Запоминает, какие из постов, на которые ссылается пачка, есть в
+        базе: ignore_conflicts не спасает от ошибки внешнего ключа, и
+        одна ссылка на пропавший пост сорвала бы всю пачку."""
+        ids = set()
+        for record in records:
+            try:
+                ids.add(int(record['post']))
+            except (KeyError, TypeError, ValueError):
+                pass
+        self.post_ids = set(Post.objects.filter(
+            pk__in=ids
+        ).values_list('pk', flat=True)) if ids else set()
+
+    def post_id(self, value):
+        post_id = int(value)
+        if post_id not in self.post_ids:
+            raise RowError(f'нет поста {post_id}')
+        return post_id
+
+    def user_id(self, username):
+        try:
+            return self.users[username]
+        except KeyError:
+            raise RowError(f'нет пользователя {username}')
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        try:
+            return self.groups[slug]
+        except KeyError:
+            raise RowError(f'нет группы {slug}')
+
+    def date(self, value):
+        if not value:
+            return timezone.now()
+        date = parse_datetime(value)
+        if date is None:
+            raise RowError(f'неверная дата {value}')
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        return date
+
+    def make_post(self, record):
+        return Post(
+            pk=record.get('id') or None,
+            text=record['text'],
+            author_id=self.user_id(record['author']),
+            group_id=self.group_id(record.get('group')),
+            pub_date=self.date(record.get('pub_date')),
+            image=record.get('image') or '',
+            video=record.get('video') or None,
+        )
+
+    def make_comment(self, record):
+        return Comment(
+            pk=record.get('id') or None,
+            post_id=self.post_id(record['post']),
+            author_id=self.user_id(record['author']),
+            text=record['text'],
+            pub_date=self.date(record.get('pub_date')),
+        )
+
+    def make_like(self, record):
+        return Like(
+            user_id=self.user_id(record['user']),
+            post_id=self.post_id(record['post']),
+            pub_date=self.date(record.get('pub_date')),
+        )
+
+    def make_follow(self, record):
+        user_id = self.user_id(record['user'])
+        author_id = self.user_id(record['author'])
+        if user_id == author_id:
+            raise RowError('подписка на себя')
+        return Follow(user_id=user_id, author_id=author_id,
+                      pub_date=self.date(record.get('pub_date')))
+
+    def reset_sequences(self):
+        """После вставки постов и комментариев с явными id сдвигает
+        последовательности pk (PostgreSQL); в SQLite запросов нет."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Post, Comment]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import CHUNK_SIZE, get_backend
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает поисковый индекс постов, читая их из базы '
+            'пачками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько постов читать и записывать за раз.'
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        total = backend.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{type(backend).__name__}: проиндексировано постов: {total}.'
+        ))
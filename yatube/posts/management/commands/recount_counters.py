@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts import feed
+from posts.caching import ALL_PAGES, touch_pages
+from posts.models import Post, Comment, Follow, Like, User
+from users.models import Profile
+
+BATCH_SIZE = 1000
+
+
+def count_subquery(model, field, outer='pk'):
+    """COUNT(*) строк model, у которых field указывает на outer."""
+    counter = model.objects.filter(
+        **{field: OuterRef(outer)}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(
+        Subquery(counter, output_field=models.IntegerField()), 0
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики постов и профилей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько строк пересчитывать за одну транзакцию.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        created = self.create_missing_profiles(batch_size)
+        posts = self.recount(
+            Post.objects.all(), batch_size,
+            likes_count=count_subquery(Like, 'post'),
+            comments_count=count_subquery(Comment, 'post'),
+        )
+        celebrities = list(Profile.objects.filter(
+            followers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('user_id', flat=True))
+        profiles = self.recount(
+            Profile.objects.all(), batch_size,
+            posts_count=count_subquery(Post, 'author', 'user'),
+            followers_count=count_subquery(Follow, 'author', 'user'),
+        )
+        # Авторы, опустившиеся после пересчета до лимита, догоняют ленты,
+        # как после отписки.
+        for author_id in Profile.objects.filter(
+            user_id__in=celebrities,
+            followers_count__lte=settings.FEED_FANOUT_LIMIT,
+        ).values_list('user_id', flat=True):
+            feed.catch_up(author_id)
+        if posts or profiles:
+            touch_pages(ALL_PAGES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано профилей: {created}, исправлено постов: {posts}, '
+            f'исправлено профилей: {profiles}.'
+        ))
+
+    def create_missing_profiles(self, batch_size):
+        missing = User.objects.filter(profile__isnull=True).values_list(
+            'pk', flat=True
+        )
+        profiles = Profile.objects.bulk_create(
+            [Profile(user_id=pk) for pk in missing.iterator()],
+            batch_size=batch_size,
+        )
+        return len(profiles)
+
+    def recount(self, queryset, batch_size, **counters):
+        """Проходит таблицу по pk пачками и сохраняет только изменившиеся
+        счетчики через bulk_update."""
+        fields = list(counters)
+        actual = {f'actual_{name}': expr for name, expr in counters.items()}
+        queryset = queryset.order_by('pk').only('pk', *fields).annotate(
+            **actual
+        )
+        last_pk, fixed = 0, 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return fixed
+            changed = []
+            for obj in batch:
+                if any(getattr(obj, name) != getattr(obj, f'actual_{name}')
+                       for name in fields):
+                    for name in fields:
+                        setattr(obj, name, getattr(obj, f'actual_{name}'))
+                    changed.append(obj)
+            with transaction.atomic():
+                queryset.model.objects.bulk_update(changed, fields)
+            fixed += len(changed)
+            last_pk = batch[-1].pk
@@ -0,0 +1,124 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts.caching import ALL_PAGES, touch_pages
+from posts.models import Comment, Group, Post, User
+from users.models import Profile
+
+BATCH_SIZE = 10000
+PERIOD_DAYS = 365 * 3
+COMMENTED_POSTS = 10000  # комментарии достаются последним постам
+
+
+@contextmanager
+def explicit_pub_date(*models):
+    """Дает bulk_create сохранить заданные pub_date вместо текущего
+    времени."""
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами и комментариями для замеров производительности.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=0)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько строк вставлять одним INSERT.'
+        )
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора для повторяемости.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        prefix = f'seed{int(self.now.timestamp())}_'
+        users = self.create_users(prefix, options['users'])
+        groups = self.create_groups(prefix, options['groups'])
+        with explicit_pub_date(Post, Comment):
+            posts = self.create_posts(users, groups, options['posts'])
+            comments = self.create_comments(users, options['comments'])
+        # bulk_create не шлет сигналов, страницы для анонимов устаревают здесь.
+        touch_pages(ALL_PAGES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, групп: {len(groups)}, '
+            f'постов: {posts}, комментариев: {comments}. Счетчики и '
+            f'поисковый индекс обновят recount_counters и '
+            f'rebuild_search_index.'
+        ))
+
+    def random_date(self):
+        return self.now - timedelta(
+            seconds=self.random.randrange(PERIOD_DAYS * 24 * 60 * 60)
+        )
+
+    def create_users(self, prefix, count):
+        # batch_size не передается: Django 2.2 не ограничивает явный размер
+        # лимитами SQLite, а сам делит вставку на допустимые пачки.
+        User.objects.bulk_create(
+            [User(username=f'{prefix}user{i}') for i in range(count)]
+        )
+        users = list(User.objects.filter(
+            username__startswith=prefix
+        ).values_list('pk', flat=True))
+        Profile.objects.bulk_create([Profile(user_id=pk) for pk in users])
+        return users
+
+    def create_groups(self, prefix, count):
+        Group.objects.bulk_create([
+            Group(title=f'Группа {i}', slug=f'{prefix}group{i}')
+            for i in range(count)
+        ])
+        return list(Group.objects.filter(
+            slug__startswith=prefix
+        ).values_list('pk', flat=True)) + [None]
+
+    def insert(self, model, total, make):
+        created = 0
+        while created < total:
+            size = min(self.batch_size, total - created)
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    [make(created + i) for i in range(size)]
+                )
+            created += size
+            self.stdout.write(f'{model.__name__}: {created}/{total}')
+        return created
+
+    def create_posts(self, users, groups, count):
+        return self.insert(Post, count, lambda i: Post(
+            text=f'Синтетический пост номер {i}',
+            author_id=self.random.choice(users),
+            group_id=self.random.choice(groups),
+            pub_date=self.random_date(),
+        ))
+
+    def create_comments(self, users, count):
+        posts = list(Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:COMMENTED_POSTS])
+        if not posts:
+            return 0
+        return self.insert(Comment, count, lambda i: Comment(
+            text=f'Комментарий {i}',
+            author_id=self.random.choice(users),
+            post_id=self.random.choice(posts),
+            pub_date=self.random_date(),
+        ))
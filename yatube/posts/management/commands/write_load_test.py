@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.test import RequestFactory
+
+from posts.models import Post, User
+from posts.views import LikePost, PostCommentAdd, UnlikePost
+
+PREFIX = 'loadtest_'
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест путей записи: потоки лайкают, снимают лайк '
+            'и комментируют один пост. Чтобы сравнить профили базы, '
+            'запустите его с разными DB_ENGINE.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Длительность теста в секундах.')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        users = [
+            User.objects.create_user(username=f'{PREFIX}{i}')
+            for i in range(threads)
+        ]
+        post = Post.objects.create(text='Нагрузочный тест', author=users[0])
+        deadline = time.monotonic() + options['duration']
+        results = Counter()
+        lock = threading.Lock()
+        workers = [
+            threading.Thread(
+                target=self.work, args=(user, post, deadline, results, lock)
+            )
+            for user in users
+        ]
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+        self.report(results, elapsed)
+        User.objects.filter(username__startswith=PREFIX).delete()
+
+    def work(self, user, post, deadline, results, lock):
+        factory = RequestFactory(HTTP_REFERER='/')
+        paths = (
+            ('like', LikePost.as_view(), lambda: factory.get('/')),
+            ('unlike', UnlikePost.as_view(), lambda: factory.get('/')),
+            ('comment', PostCommentAdd.as_view(),
+             lambda: factory.post('/', {'text': 'Комментарий'})),
+        )
+        local = Counter()
+        try:
+            while time.monotonic() < deadline:
+                for name, view, make_request in paths:
+                    request = make_request()
+                    request.user = user
+                    try:
+                        view(request, post_id=post.pk)
+                    except DatabaseError:
+                        local[f'{name}_errors'] += 1
+                    else:
+                        local[name] += 1
+        finally:
+            connection.close()
+            with lock:
+                results.update(local)
+
+    def report(self, results, elapsed):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('PRAGMA journal_mode')
+                mode = f'SQLite, journal_mode={cursor.fetchone()[0]}'
+            else:
+                mode = connection.vendor
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{settings.DB_ENGINE}: {mode}, {elapsed:.1f} с'
+        ))
+        for name in ('like', 'unlike', 'comment'):
+            self.stdout.write(
+                f'{name}: {results[name] / elapsed:.1f} в секунду, '
+                f'ошибок: {results[name + "_errors"]}'
+            )
+        total = sum(results[name] for name in ('like', 'unlike', 'comment'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего записей в секунду: {total / elapsed:.1f}'
+        ))
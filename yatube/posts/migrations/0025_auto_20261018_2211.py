@@ -0,0 +1,51 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:11
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model):
+    counter = model.objects.filter(
+        post=OuterRef('pk')
+    ).order_by().values('post').annotate(total=Count('pk')).values('total')
+    return Coalesce(
+        Subquery(counter, output_field=models.IntegerField()), 0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(
+        likes_count=count_subquery(apps.get_model('posts', 'Like')),
+        comments_count=count_subquery(apps.get_model('posts', 'Comment')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_auto_20221218_0029'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='follow',
+            options={'ordering': ['-pub_date']},
+        ),
+        migrations.AlterModelOptions(
+            name='like',
+            options={'ordering': ['-pub_date']},
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество комментариев'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество лайков'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
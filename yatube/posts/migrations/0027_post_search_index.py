@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts '
+                'USING fts5(text, tokenize="unicode61 remove_diacritics 2")'
+            )
+        except OperationalError:
+            # SQLite собран без FTS5, поиск останется по подстроке.
+            pass
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS posts_post_text_fts ON posts_post '
+            "USING GIN (to_tsvector('russian'::regconfig, "
+            "COALESCE(text, '')))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS posts_post_text_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0026_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
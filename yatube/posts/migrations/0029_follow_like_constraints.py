@@ -0,0 +1,70 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:29
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field, outer='pk'):
+    counter = model.objects.filter(
+        **{field: OuterRef(outer)}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(
+        Subquery(counter, output_field=models.IntegerField()), 0
+    )
+
+
+def delete_duplicates(model, field):
+    """Оставляет первую строку каждой пары (user, field), возвращает
+    значения field, у которых были повторы."""
+    duplicates = model.objects.order_by().values('user', field).annotate(
+        first=Min('pk'), total=Count('pk')
+    ).filter(total__gt=1)
+    touched = set()
+    for row in duplicates:
+        model.objects.filter(
+            user=row['user'], **{field: row[field]}
+        ).exclude(pk=row['first']).delete()
+        touched.add(row[field])
+    return touched
+
+
+def remove_duplicates(apps, schema_editor):
+    Like = apps.get_model('posts', 'Like')
+    Follow = apps.get_model('posts', 'Follow')
+    posts = delete_duplicates(Like, 'post')
+    apps.get_model('posts', 'Post').objects.filter(pk__in=posts).update(
+        likes_count=count_subquery(Like, 'post')
+    )
+    authors = delete_duplicates(Follow, 'author')
+    apps.get_model('users', 'Profile').objects.filter(
+        user__in=authors
+    ).update(followers_count=count_subquery(Follow, 'author', 'user'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0028_post_image_hash'),
+        ('users', '0003_profile'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'pub_date'], name='follow_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', 'pub_date'], name='like_post_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_like'),
+        ),
+    ]
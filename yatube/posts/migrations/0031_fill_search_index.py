@@ -0,0 +1,44 @@
+import itertools
+
+from django.db import migrations
+
+from posts.search import CHUNK_SIZE, FTS_TABLE, SQLiteSearchBackend
+
+
+def fill_search_index(apps, schema_editor):
+    """Заносит в FTS5 посты, созданные до появления индекса: сигналы
+    индексируют только новые посты. Текст готовится тем же prepare, что и
+    у SQLiteSearchBackend, иначе старые посты искались бы по-другому. В
+    PostgreSQL GIN-индекс строится по существующим строкам сам."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    if FTS_TABLE not in connection.introspection.table_names():
+        return
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.using(connection.alias).order_by().values_list(
+        'pk', 'text'
+    ).iterator(chunk_size=CHUNK_SIZE)
+    with connection.cursor() as cursor:
+        while True:
+            chunk = [
+                (pk, SQLiteSearchBackend.prepare(text))
+                for pk, text in itertools.islice(posts, CHUNK_SIZE)
+            ]
+            if not chunk:
+                break
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE}(rowid, text) '
+                f'VALUES (%s, %s)', chunk
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0030_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
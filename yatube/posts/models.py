@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch, Value
 from django.contrib.auth import get_user_model
 from core.models import CreatedModel
 from django.urls import reverse
@@ -32,8 +33,36 @@ class Group(models.Model):
         verbose_name_plural = 'Группы'
 
 
+class PostQuerySet(models.QuerySet):
+    """Выборки постов для лент: лайк зрителя тем же запросом."""
+
+    def with_liked(self, user):
+        """Добавляет флаг is_liked: лайкнул ли пост текущий пользователь."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_liked=Value(False, output_field=models.BooleanField())
+            )
+        return self.annotate(is_liked=Exists(
+            Like.objects.filter(user=user, post=OuterRef('pk'))
+        ))
+
+    def for_list(self, user):
+        """Все, что нужно карточке поста в posts_form.html."""
+        return self.select_related('author', 'group').with_liked(user)
+
+    def for_detail(self):
+        """Все, что нужно странице поста, кроме превью подписчиков и
+        лайков: их PostDetail читает ограниченными выборками."""
+        return self.select_related(
+            'author__profile', 'group'
+        ).prefetch_related(
+            Prefetch('comments',
+                     queryset=Comment.objects.select_related('author')),
+        )
+
+
 class Post(CreatedModel):
-    objects = None
+    objects = PostQuerySet.as_manager()
     text = models.TextField(
         verbose_name='Пост',
         help_text='Введите текст вашего сообщения.',
@@ -57,6 +86,12 @@ class Post(CreatedModel):
         blank=True,
         help_text='Загрузите картинку'
     )
+    image_hash = models.CharField(
+        'Хеш адаптивных вариантов картинки',
+        max_length=40,
+        blank=True,
+        editable=False,
+    )
     video = EmbedVideoField(
         blank=True,
         null=True,
@@ -68,6 +103,14 @@ class Post(CreatedModel):
         blank=True,
         null=True
     )
+    likes_count = models.PositiveIntegerField(
+        'Количество лайков',
+        default=0,
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+    )
 
     def __str__(self):
         return self.text[:15]
@@ -76,6 +119,12 @@ class Post(CreatedModel):
         ordering = ["-pub_date"]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['group', '-pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_pub_date_idx'),
+        ]
 
 
 class Comment(CreatedModel):
@@ -99,6 +148,10 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=['post', '-pub_date'],
+                         name='comment_post_pub_date_idx'),
+        ]
 
 
 class Follow(CreatedModel):
@@ -113,6 +166,17 @@ class Follow(CreatedModel):
         related_name='following'
     )
 
+    class Meta:
+        ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=['author', 'pub_date'],
+                         name='follow_author_pub_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
 
 class Like(CreatedModel):
     user = models.ForeignKey(
@@ -124,4 +188,41 @@ class Like(CreatedModel):
         Post,
         on_delete=models.CASCADE,
         related_name='likes'
-    )
\ No newline at end of file
+    )
+
+    class Meta:
+        ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=['post', 'pub_date'],
+                         name='like_post_pub_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_like'),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Пост в ленте подписчика, раскладывается при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    pub_date = models.DateTimeField('Дата')
+
+    class Meta:
+        ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='feed_user_pub_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_entry'),
+        ]
@@ -0,0 +1,191 @@
+"""Полнотекстовый поиск по постам.
+
+Бэкенд выбирается по настройке SEARCH_BACKEND, по умолчанию - по движку
+базы: FTS5 для SQLite, SearchVector с GIN-индексом для PostgreSQL и
+простой поиск по подстроке для остальных.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+CHUNK_SIZE = 2000
+
+WORD = re.compile(r'\w+')
+RVRE = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|((?<=[ая])(ла|на|ете|йте|'
+    r'ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_SUFFIX = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    """Стеммер Портера для русского языка, остальные слова не меняет."""
+    word = word.lower().replace('ё', 'е')
+    match = RVRE.match(word)
+    if not match:
+        return word
+    prefix, rv = match.groups()
+    temp = PERFECTIVE_GERUND.sub('', rv, 1)
+    if temp == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        temp = ADJECTIVE.sub('', rv, 1)
+        if temp != rv:
+            rv = PARTICIPLE.sub('', temp, 1)
+        else:
+            temp = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if temp == rv else temp
+    else:
+        rv = temp
+    rv = re.sub('и$', '', rv, 1)
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_SUFFIX.sub('', rv, 1)
+    temp = re.sub('ь$', '', rv, 1)
+    if temp == rv:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        rv = re.sub('нн$', 'н', rv, 1)
+    else:
+        rv = temp
+    return prefix + rv
+
+
+def terms(text):
+    return WORD.findall(text.lower())
+
+
+class SearchBackend:
+    """Поиск подстрокой без индекса, как было до полнотекстового поиска."""
+
+    def search(self, queryset, query):
+        return queryset.filter(text__icontains=query)
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def rebuild(self, chunk_size=CHUNK_SIZE):
+        return 0
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5-таблица со стеммированным текстом, rowid равен id поста.
+
+    FTS5 не умеет русскую морфологию, поэтому текст и запрос стеммируются
+    здесь же, а таблица синхронизируется сигналами post_save/post_delete.
+    Каждое слово запроса ищется как префикс, результаты сортируются по bm25.
+    """
+
+    def search(self, queryset, query):
+        match = ' '.join(f'"{stem(term)}"*' for term in terms(query))
+        if not match:
+            return queryset
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = posts_post.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'{FTS_TABLE}.rank'},
+        ).order_by('search_rank', '-pub_date')
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {FTS_TABLE}(rowid, text) '
+                f'VALUES (%s, %s)',
+                [post.pk, self.prepare(post.text)]
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+    def rebuild(self, chunk_size=CHUNK_SIZE):
+        posts = Post.objects.order_by().values_list('pk', 'text')
+        chunk, total = [], 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        for pk, text in posts.iterator(chunk_size=chunk_size):
+            chunk.append((pk, self.prepare(text)))
+            if len(chunk) == chunk_size:
+                total += self.insert(chunk)
+                chunk = []
+        return total + self.insert(chunk)
+
+    def insert(self, rows):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (%s, %s)', rows
+            )
+        return len(rows)
+
+    @staticmethod
+    def prepare(text):
+        return ' '.join(stem(term) for term in terms(text))
+
+
+class PostgresSearchBackend(SearchBackend):
+    """to_tsvector('russian') по GIN-индексу из миграции 0027.
+
+    Стемминг делает сам PostgreSQL, к каждому слову запроса добавляется
+    :* для поиска по префиксу, сортировка по ts_rank.
+    """
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, SearchVector
+        )
+        raw = ' & '.join(f'{term}:*' for term in terms(query))
+        if not raw:
+            return queryset
+        vector = SearchVector('text', config='russian')
+        search_query = SearchQuery(raw, config='russian', search_type='raw')
+        return queryset.annotate(
+            search=vector, rank=SearchRank(vector, search_query)
+        ).filter(search=search_query).order_by('-rank', '-pub_date')
+
+    def rebuild(self, chunk_size=CHUNK_SIZE):
+        with connection.cursor() as cursor:
+            cursor.execute('REINDEX INDEX posts_post_text_fts')
+        return Post.objects.count()
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def fts_available():
+    """Таблицы нет, если SQLite собран без FTS5 и миграция ее пропустила."""
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def get_backend():
+    if settings.SEARCH_BACKEND:
+        return import_string(settings.SEARCH_BACKEND)()
+    if connection.vendor == 'sqlite' and not fts_available():
+        return SearchBackend()
+    return BACKENDS.get(connection.vendor, SearchBackend)()
@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import feed, search
+from .caching import ALL_PAGES, post_scopes, touch_pages
+from .follows import forget_following
+from .models import Follow, Group, Post
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    forget_following(instance.user_id)
+    if created:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def purge_feed(sender, instance, **kwargs):
+    forget_following(instance.user_id)
+    feed.purge(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_from_index(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def touch_post_pages(sender, instance, **kwargs):
+    touch_pages(*post_scopes(instance), f'author:{instance.author_id}')
+
+
+@receiver([post_save, post_delete], sender=Group)
+def touch_group_pages(sender, instance, **kwargs):
+    # Группа видна в карточках на любых страницах, а при удалении
+    # посты теряют ее без сигналов.
+    touch_pages(ALL_PAGES)
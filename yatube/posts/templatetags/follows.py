@@ -0,0 +1,11 @@
+from django import template
+
+from posts.follows import is_following
+
+register = template.Library()
+
+
+@register.filter
+def follows(user, author):
+    """{% if user|follows:author %} - подписан ли user на автора."""
+    return is_following(user, author)
@@ -0,0 +1,30 @@
+from django import template
+
+from posts import variants
+from posts.thumbnails import thumbnail_url
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post, preset, sizes='100vw', css_class='', style=''):
+    """<picture> с WebP и JPEG srcset из posts.variants.PRESETS.
+
+    В src остается миниатюра того же размера (для 'full' - оригинал),
+    она же показывается, пока варианты еще не нарезаны.
+    """
+    if preset == 'full':
+        src = post.image.url
+    else:
+        src = thumbnail_url(post.image, preset)
+    sources = []
+    if post.image_hash:
+        sources = variants.srcsets(post.image_hash, preset)
+    return {
+        'src': src,
+        'sources': sources[:-1],
+        'srcset': sources[-1][1] if sources else '',
+        'sizes': sizes,
+        'css_class': css_class,
+        'style': style,
+    }
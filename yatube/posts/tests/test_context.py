@@ -1,17 +1,27 @@
 import shutil
 import tempfile
 from django.conf import settings
-from django.core.cache import cache
+from django.core.cache import cache, caches
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
+from django.core.files.storage import default_storage
+from .. import thumbnails, variants
 from ..models import Group, Post, Comment
 from django.urls import reverse
 from django import forms
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -74,9 +84,11 @@ class TestContext(TestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
         cache.clear()
+        caches['posts'].clear()
 
     def setUp(self):
         cache.clear()
+        caches['posts'].clear()
         self.rbychin = Client()
         self.rbychin.force_login(self.user)
         self.antony = Client().force_login(self.another_user)
@@ -173,6 +185,7 @@ class TestContext(TestCase):
         response_content_second = response_second.content
         self.assertEqual(response_content_first, response_content_second)
         cache.clear()
+        caches['posts'].clear()
         response_third = self.rbychin.get(
             reverse('posts:index')
         )
@@ -188,3 +201,116 @@ class TestContext(TestCase):
         self.assertEqual(
             response.context['comments'].first().text, 'Мой комментарий'
         )
+
+
+class CardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(text='Исходный текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        caches['posts'].clear()
+        self.client = Client(HTTP_REFERER='/')
+        self.client.force_login(self.user)
+
+    def test_card_cached_until_post_changes(self):
+        """Карточка берется из кеша, пока пост не изменили через сайт."""
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Исходный текст')
+        self.client.post(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новый текст'}
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый текст')
+
+    def test_author_and_group_not_cached(self):
+        """Имя автора и название группы в карточке не ждут истечения
+        кеша: их правка не меняет версию карточки."""
+        group = Group.objects.create(title='Старая группа', slug='card')
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        guest = Client()
+        guest.get(reverse('posts:index'))
+        group.title = 'Новая группа'
+        group.save()
+        User.objects.filter(pk=self.user.pk).update(first_name='Лев')
+        response = guest.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Старая группа')
+        self.assertContains(response, 'Лев')
+
+    def test_viewer_part_not_cached(self):
+        """Лайк и крестик удаления рендерятся для каждого зрителя."""
+        self.client.get(reverse('posts:index'))
+        delete_url = reverse('posts:post_delete',
+                             kwargs={'post_id': self.post.pk})
+        response = Client().get(reverse('posts:index'))
+        self.assertNotContains(response, delete_url)
+        self.client.get(reverse('posts:post_like',
+                                kwargs={'post_id': self.post.pk}))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, delete_url)
+        self.assertContains(response, reverse(
+            'posts:post_unlike', kwargs={'post_id': self.post.pk}))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name='thumb.gif', content=SMALL_GIF, content_type='image/gif'
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        caches['posts'].clear()
+
+    def test_original_until_thumbnail_ready(self):
+        """Пока миниатюра не нарезана, карточка показывает оригинал."""
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+        self.assertIsNone(thumbnails.cached_thumbnail(self.post.image, 'card'))
+        thumbnails.generate(self.post.image.name, self.post.pk)
+        thumbnail = thumbnails.cached_thumbnail(self.post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, thumbnail)
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_responsive_variants(self):
+        """После нарезки карточка отдает srcset из вариантов с хешем."""
+        thumbnails.generate(self.post.image.name, self.post.pk)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertTrue(post.image_hash)
+        for preset in variants.PRESETS:
+            # Оригинал шириной 2 пикселя не увеличивается.
+            self.assertEqual(variants.widths_for(preset, 2), (2,))
+            for width in variants.widths_for(preset, 2):
+                for ext, _, _ in variants.formats():
+                    with self.subTest(preset=preset, width=width, ext=ext):
+                        self.assertTrue(default_storage.exists(
+                            variants.variant_name(
+                                post.image_hash, preset, width, ext
+                            )
+                        ))
+        response = Client().get(reverse('posts:index'))
+        card = variants.variant_name(post.image_hash, 'card', 2, 'jpg')
+        self.assertContains(response, default_storage.url(card) + ' 2w')
+        self.assertNotContains(response, ' 1080w')
+        self.assertContains(response, 'type="image/webp"')
@@ -0,0 +1,61 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from ..models import Post, Group, Follow, Comment, Like
+
+User = get_user_model()
+
+
+class ExportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='export')
+
+    def test_export_round_trip(self):
+        """Выгрузка export_posts загружается import_posts без потерь."""
+        post = Post.objects.create(
+            text='Туда и обратно', author=self.author, group=self.group,
+            image='posts/pic.gif', video='https://youtu.be/abc'
+        )
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='Комментарий')
+        Like.objects.create(user=self.reader, post=post)
+        Follow.objects.create(user=self.reader, author=self.author)
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('export_posts', directory, chunk_size=1,
+                         stdout=StringIO())
+            files = sorted(Path(directory).glob('*.jsonl'))
+            Post.objects.all().delete()
+            Follow.objects.all().delete()
+            call_command('import_posts', *map(str, files), stdout=StringIO())
+        restored = Post.objects.get(pk=post.pk)
+        self.assertEqual(
+            (restored.text, restored.group, restored.pub_date,
+             restored.image.name, restored.video),
+            (post.text, self.group, post.pub_date, post.image.name,
+             post.video)
+        )
+        self.assertEqual(Comment.objects.get().pk, comment.pk)
+        self.assertTrue(Like.objects.filter(post=restored).exists())
+        self.assertTrue(Follow.objects.exists())
+
+    def test_user_export_skips_foreign_posts(self):
+        """Лайк чужого поста из выгрузки пользователя без самого поста
+        пропускается при загрузке."""
+        post = Post.objects.create(text='Чужой', author=self.author)
+        Like.objects.create(user=self.reader, post=post)
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('export_posts', directory, user='reader',
+                         stdout=StringIO())
+            post.delete()
+            call_command('import_posts',
+                         *map(str, Path(directory).glob('*.jsonl')),
+                         stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(Like.objects.exists())
@@ -1,14 +1,19 @@
 import shutil
 import tempfile
+from io import BytesIO
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from http import HTTPStatus
 from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
 
 from ..forms import PostForm
 from ..models import Post, Group
-from django.test import TestCase, Client, override_settings
+from django.test import (
+    Client, RequestFactory, TestCase, override_settings,
+)
+from core.uploads import LimitedUploadHandler
 
 
 User = get_user_model()
@@ -127,3 +132,87 @@ class FormTest(TestCase):
                 'posts:add_comment', kwargs={'post_id': self.post.pk}
             ), data=form_data, follow=True
         )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorize_client = Client()
+        self.authorize_client.force_login(self.user)
+
+    def upload(self, name, content):
+        return self.authorize_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(name, content, 'image/jpeg'),
+            }
+        )
+
+    def test_exif_stripped(self):
+        """EXIF удаляется, поворот из него применяется к картинке."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera'
+        buffer = BytesIO()
+        Image.new('RGB', (4, 2)).save(buffer, 'JPEG', exif=exif.tobytes())
+        self.upload('photo.jpg', buffer.getvalue())
+        post = Post.objects.get(author=self.user)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (2, 4))
+            self.assertEqual(dict(image.getexif()), {})
+
+    @override_settings(FILE_UPLOAD_MAX_BYTES=1024)
+    def test_too_large_file_rejected(self):
+        """Файл больше лимита не сохраняется, форма сообщает об ошибке."""
+        buffer = BytesIO()
+        Image.effect_noise((64, 64), 100).save(buffer, 'PNG')
+        response = self.upload('noise.png', buffer.getvalue())
+        self.assertFormError(response, 'form', 'image',
+                             'Файл больше 1,0\xa0КБ.')
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
+
+    @override_settings(FILE_UPLOAD_MAX_BYTES=1024)
+    def test_upload_aborted_past_limit(self):
+        """На лимите разбор тела обрывается: файл не дописывается, поля
+        после него не читаются."""
+        request = RequestFactory().post('/', {
+            'image': SimpleUploadedFile('big.png', b'0' * 10000),
+            'after': 'x',
+        })
+        handler = LimitedUploadHandler(request)
+        request.upload_handlers = [handler]
+        self.assertNotIn('after', request.POST)
+        self.assertNotIn('image', request.FILES)
+        self.assertTrue(handler.aborted.truncated)
+
+    @override_settings(CSRF_FAILURE_VIEW='django.views.csrf.csrf_failure')
+    def test_upload_view_checks_csrf(self):
+        """Смена обработчиков загрузки не отключает проверку CSRF."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(reverse('posts:post_create'),
+                               {'text': 'Без токена'})
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_oversize_dimensions_rejected(self):
+        """Картинка больше лимита по стороне отклоняется по заголовку."""
+        buffer = BytesIO()
+        Image.new('L', (101, 1)).save(buffer, 'PNG')
+        response = self.upload('wide.png', buffer.getvalue())
+        self.assertEqual(
+            response.context['form'].errors['image'][0][:30],
+            'Картинка должна быть не больше'
+        )
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
@@ -0,0 +1,105 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from ..models import Post, Group, Follow, Comment, Like
+
+User = get_user_model()
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='import')
+
+    def import_files(self, **files):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for name, content in files.items():
+                path = Path(directory) / name.replace('_', '.')
+                path.write_text(content, encoding='utf-8')
+                paths.append(str(path))
+            out, err = StringIO(), StringIO()
+            call_command('import_posts', *paths, batch_size=2,
+                         stdout=out, stderr=err)
+        self.output = out.getvalue()
+        return err.getvalue()
+
+    def test_import_jsonl_and_csv(self):
+        """Посты, комментарии, лайки и подписки импортируются пачками,
+        ссылки на авторов и группы разрешаются по username и slug."""
+        posts = [
+            {'id': 100 + i, 'text': f'Импорт {i}', 'author': 'author',
+             'group': 'import', 'pub_date': f'2020-01-0{i + 1}T10:00:00'}
+            for i in range(3)
+        ]
+        errors = self.import_files(
+            posts_jsonl='\n'.join(map(json.dumps, posts)),
+            comments_csv='post,author,text,pub_date\n'
+                         '100,reader,Комментарий,\n'
+                         '101,nobody,Потерянный,\n',
+            likes_jsonl=json.dumps({'user': 'reader', 'post': 102}),
+            follows_csv='user,author\nreader,author\nreader,author\n',
+        )
+        self.assertIn('nobody', errors)
+        post = Post.objects.get(pk=100)
+        self.assertEqual((post.author, post.group, post.pub_date.day),
+                         (self.author, self.group, 1))
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Comment.objects.get().post, post)
+        self.assertTrue(Like.objects.filter(user=self.reader,
+                                            post_id=102).exists())
+        self.assertEqual(Follow.objects.count(), 1)
+        new = Post.objects.create(text='После импорта', author=self.author)
+        self.assertGreater(new.pk, 102)
+
+    def test_import_fills_feeds(self):
+        """Загруженные посты и подписки попадают в ленту подписчика."""
+        self.import_files(
+            posts_jsonl=json.dumps({'id': 200, 'text': 'В ленту',
+                                    'author': 'author'}),
+            follows_csv='user,author\nreader,author\n',
+        )
+        self.import_files(posts_jsonl=json.dumps(
+            {'id': 201, 'text': 'Позже', 'author': 'author'}
+        ))
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']], [201, 200]
+        )
+
+    def test_bad_rows_are_skipped(self):
+        """Битая строка JSON и лайк несуществующего поста пропускаются,
+        дубли не считаются вставленными."""
+        post = Post.objects.create(text='Есть', author=self.author)
+        like = json.dumps({'user': 'reader', 'post': post.pk})
+        errors = self.import_files(likes_jsonl='\n'.join((
+            like, '{"user": "reader", "post"',
+            json.dumps({'user': 'reader', 'post': 999}), like,
+        )))
+        self.assertIn('JSON', errors)
+        self.assertIn('999', errors)
+        self.assertEqual(Like.objects.get().post, post)
+        self.assertIn('вставлено 1', self.output)
+        self.assertIn('дублей: 1', self.output)
+
+    def test_import_creates_users(self):
+        """С --create-users недостающие авторы создаются вместе с профилем."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'posts.csv'
+            path.write_text('text,author\nПост,newcomer\n', encoding='utf-8')
+            call_command('import_posts', str(path), create_users=True,
+                         stdout=StringIO())
+        newcomer = User.objects.get(username='newcomer')
+        self.assertTrue(Post.objects.filter(author=newcomer).exists())
+        self.assertIsNotNone(newcomer.profile.pk)
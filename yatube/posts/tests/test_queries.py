@@ -0,0 +1,150 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from ..models import Post, Group, Comment, Like, Follow
+
+User = get_user_model()
+
+
+class ListQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Автор с группой и подписчиком, один лайкнутый и прокомментированный
+        пост. Остальные посты добавляются в тестах, чтобы сравнить число
+        запросов для страниц с одной и с десятью карточками."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Группа', slug='queries')
+        cls.post = Post.objects.create(
+            text='Первый пост', author=cls.author, group=cls.group
+        )
+        Like.objects.create(user=cls.user, post=cls.post)
+        Comment.objects.create(text='Комментарий', author=cls.user,
+                               post=cls.post)
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        caches['posts'].clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def count_queries(self, address):
+        # Подписки читателя кешируются первым запросом.
+        self.client.get(address)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(address)
+        return len(context.captured_queries)
+
+    def test_list_queries_do_not_grow_with_posts(self):
+        """Число запросов страницы не зависит от количества карточек."""
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?search=пост',
+        )
+        single = {address: self.count_queries(address)
+                  for address in addresses}
+        for i in range(9):
+            post = Post.objects.create(
+                text=f'Пост {i}', author=self.author, group=self.group
+            )
+            Like.objects.create(user=self.user, post=post)
+            Comment.objects.create(text='Ещё', author=self.author, post=post)
+        for address in addresses:
+            with self.subTest(address=address):
+                self.assertEqual(self.count_queries(address), single[address])
+
+    def test_list_liked_flag(self):
+        """Карточки получают флаг лайка текущего пользователя."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertTrue(response.context['page_obj'][0].is_liked)
+        response = Client().get(reverse('posts:index'))
+        self.assertFalse(response.context['page_obj'][0].is_liked)
+
+
+class DetailQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='detail_author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        caches['posts'].clear()
+
+    def add_audience(self, size):
+        for i in range(size):
+            user = User.objects.create_user(username=f'fan_{size}_{i}')
+            Follow.objects.create(user=user, author=self.author)
+            Like.objects.create(user=user, post=self.post)
+            Comment.objects.create(text='Комментарий', author=user,
+                                   post=self.post)
+
+    @override_settings(ANON_PAGE_CACHE_SEC=0)
+    def test_detail_query_budget(self):
+        """Страница поста укладывается в постоянное число запросов."""
+        address = reverse('posts:post_detail',
+                          kwargs={'post_id': self.post.pk})
+        reader = User.objects.create_user(username='detail_reader')
+        client = Client()
+        client.force_login(reader)
+        # Первые запросы кладут в кеш автора поста для условного GET и
+        # подписки читателя.
+        Client().get(address)
+        client.get(address)
+        for size in (1, 10):
+            self.add_audience(size)
+            with self.subTest(size=size, user='anonymous'):
+                with self.assertNumQueries(4):
+                    Client().get(address)
+            with self.subTest(size=size, user='reader'):
+                with self.assertNumQueries(6):
+                    client.get(address)
+
+
+class ListingIndexesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('seed_posts', posts=30, comments=20, users=3, groups=2,
+                     batch_size=7, stdout=StringIO())
+
+    @skipUnless(connection.vendor == 'sqlite', 'план запроса SQLite')
+    def test_listing_queries_use_indexes(self):
+        """Ленты группы, профиля и комментарии читаются по составным
+        индексам без сортировки во временном дереве."""
+        post = Post.objects.exclude(group=None).first()
+        queries = {
+            'post_group_pub_date_idx': Post.objects.filter(group=post.group),
+            'post_author_pub_date_idx': Post.objects.filter(
+                author=post.author
+            ),
+            'comment_post_pub_date_idx': Comment.objects.filter(post=post),
+        }
+        for index, queryset in queries.items():
+            with self.subTest(index=index):
+                plan = queryset[:10].explain()
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_explain_listings(self):
+        """Замер показывает планы без индексов и с ними."""
+        out = StringIO()
+        call_command('explain_listings', runs=2, stdout=out)
+        self.assertIn('Без индексов', out.getvalue())
+        self.assertIn('С индексами', out.getvalue())
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 20)
@@ -0,0 +1,53 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from ..models import Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.cats = Post.objects.create(
+            text='Котики любят спать. Коты и котята.', author=cls.author)
+        cls.cat = Post.objects.create(
+            text='Про котов и собак', author=cls.author)
+        cls.dogs = Post.objects.create(
+            text='Собаки любят гулять', author=cls.author)
+
+    def search(self, query):
+        response = Client().get(reverse('posts:search'), {'search': query})
+        return list(response.context['page_obj'])
+
+    def test_search_stemming_and_rank(self):
+        """Поиск учитывает словоформы и сортирует по релевантности."""
+        self.assertEqual(self.search('кот'), [self.cats, self.cat])
+        self.assertEqual(self.search('собака'), [self.dogs, self.cat])
+        self.assertEqual(self.search('любить собак'), [self.dogs])
+
+    def test_search_prefix(self):
+        """Незаконченное слово ищется как префикс."""
+        self.assertEqual(self.search('гуля'), [self.dogs])
+
+    def test_search_index_sync(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.get(pk=self.dogs.pk)
+        post.text = 'Теперь про попугаев'
+        post.save()
+        self.assertEqual(self.search('попугай'), [post])
+        self.assertNotIn(post, self.search('собака'))
+        post.delete()
+        self.assertEqual(self.search('попугай'), [])
+
+    def test_rebuild_search_index(self):
+        Post.objects.bulk_create([Post(text='Черепахи', author=self.author)])
+        self.assertEqual(self.search('черепаха'), [])
+        call_command('rebuild_search_index', chunk_size=2, stdout=StringIO())
+        self.assertEqual(len(self.search('черепаха')), 1)
+        self.assertEqual(len(self.search('кот')), 2)
@@ -3,7 +3,7 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from ..models import Group, Post
 from django.urls import reverse
-from django.core.cache import cache
+from django.core.cache import cache, caches
 
 User = get_user_model()
 
@@ -30,6 +30,7 @@ class TaskURLTests(TestCase):
 
     def setUp(self):
         cache.clear()
+        caches['posts'].clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -1,9 +1,18 @@
-from django.core.cache import cache
+import hashlib
+from io import StringIO
+
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from ..models import Post, Group, Follow, Comment
+from .. import actions
+from ..caching import PAGE_LOCK_KEY, cached_page, last_changed, touch_pages
+from ..follows import FOLLOWING_KEY, following_ids, is_following
+from ..models import Post, Group, Follow, Comment, Like, FeedEntry
 
 User = get_user_model()
 
@@ -51,6 +60,7 @@ class PostTest(TestCase):
 
     def setUp(self):
         cache.clear()
+        caches['posts'].clear()
         self.guest_client = Client()
         self.authorize_client = Client()
         self.authorize_client.force_login(self.user)
@@ -184,6 +194,37 @@ class FollowTest(TestCase):
         )
         self.assertFalse(follow_obj.exists())
 
+    def test_following_ids_cached(self):
+        """Подписки зрителя читаются одним запросом и сбрасываются при
+        подписке."""
+        caches['posts'].clear()
+        Follow.objects.create(user=self.user_1, author=self.user_2)
+        user = User.objects.get(pk=self.user_1.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(is_following(user, self.user_2))
+            self.assertFalse(is_following(user, self.user_1))
+        with self.assertNumQueries(0):
+            self.assertEqual(following_ids(User(pk=self.user_1.pk)),
+                             {self.user_2.pk})
+        self.client_1.post(reverse('posts:profile_unfollow',
+                                   kwargs={'username': self.user_2.username}))
+        self.assertEqual(following_ids(User.objects.get(pk=self.user_1.pk)),
+                         frozenset())
+
+    def test_following_forgotten_after_commit(self):
+        """Множество, закешированное до коммита подписки, сбрасывается
+        после коммита."""
+        caches['posts'].clear()
+        with transaction.atomic():
+            Follow.objects.create(user=self.user_1, author=self.user_2)
+            # Параллельный запрос до коммита видит старые подписки.
+            caches['posts'].set(FOLLOWING_KEY.format(self.user_1.pk),
+                                frozenset())
+        _, forget = connection.run_on_commit[-1]
+        forget()
+        self.assertEqual(following_ids(User(pk=self.user_1.pk)),
+                         {self.user_2.pk})
+
     def test_follow_index_correctly(self):
         """Проверка корректного отображения страницы подписок"""
         Follow.objects.create(
@@ -227,3 +268,437 @@ class TestComment(TestCase):
             reverse('posts:post_detail', kwargs={'post_id': self.post_2.pk})
         )
         self.assertNotIn(self.comment, response.context['comments'])
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='fan')
+        cls.author = User.objects.create_user(username='star')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        self.client = Client(HTTP_REFERER='/')
+        self.client.force_login(self.user)
+
+    def assertCounters(self, likes, comments, followers):
+        self.post.refresh_from_db()
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.post.likes_count, likes)
+        self.assertEqual(self.post.comments_count, comments)
+        self.assertEqual(self.author.profile.followers_count, followers)
+
+    def test_counters_follow_views(self):
+        """Лайки, комментарии и подписки меняют счетчики ровно на 1."""
+        post_kwargs = {'post_id': self.post.pk}
+        author_kwargs = {'username': self.author.username}
+        for _ in range(2):
+            self.client.get(reverse('posts:post_like', kwargs=post_kwargs))
+            self.client.get(
+                reverse('posts:profile_follow', kwargs=author_kwargs))
+        self.client.post(reverse('posts:add_comment', kwargs=post_kwargs),
+                         data={'text': 'Комментарий'})
+        self.assertCounters(likes=1, comments=1, followers=1)
+        comment = Comment.objects.get(post=self.post)
+        for _ in range(2):
+            self.client.get(reverse('posts:post_unlike', kwargs=post_kwargs))
+            self.client.get(
+                reverse('posts:profile_unfollow', kwargs=author_kwargs))
+        self.client.get(reverse('posts:comment_delete',
+                                kwargs={'comment_id': comment.pk}))
+        self.assertCounters(likes=0, comments=0, followers=0)
+
+    def test_ajax_toggles(self):
+        """POST лайка и подписки отвечает JSON с новым состоянием,
+        счетчиком и адресом обратного действия."""
+        post_kwargs = {'post_id': self.post.pk}
+        author_kwargs = {'username': self.author.username}
+        for name, kwargs, expected in (
+            ('posts:post_like', post_kwargs, {
+                'liked': True, 'likes_count': 1,
+                'url': reverse('posts:post_unlike', kwargs=post_kwargs),
+            }),
+            ('posts:post_unlike', post_kwargs, {
+                'liked': False, 'likes_count': 0,
+                'url': reverse('posts:post_like', kwargs=post_kwargs),
+            }),
+            ('posts:profile_follow', author_kwargs, {
+                'following': True, 'followers_count': 1,
+                'url': reverse('posts:profile_unfollow', kwargs=author_kwargs),
+            }),
+            ('posts:profile_unfollow', author_kwargs, {
+                'following': False, 'followers_count': 0,
+                'url': reverse('posts:profile_follow', kwargs=author_kwargs),
+            }),
+        ):
+            with self.subTest(name=name):
+                response = self.client.post(reverse(name, kwargs=kwargs))
+                self.assertEqual(response.json(), expected)
+
+    def test_toggle_links_degrade_to_get(self):
+        """Кнопки остаются обычными ссылками, скрипт подключен один раз."""
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'star'})
+        )
+        self.assertContains(
+            response,
+            reverse('posts:profile_follow', kwargs={'username': 'star'})
+        )
+        self.assertContains(
+            response,
+            reverse('posts:post_like', kwargs={'post_id': self.post.pk})
+        )
+        self.assertContains(response, "closest('[data-toggle]')", count=1)
+
+    def test_duplicates_rejected(self):
+        """Повторный лайк или подписку отклоняет база."""
+        Like.objects.create(user=self.user, post=self.post)
+        Follow.objects.create(user=self.user, author=self.author)
+        for model, fields in (
+            (Like, {'user': self.user, 'post': self.post}),
+            (Follow, {'user': self.user, 'author': self.author}),
+        ):
+            with self.subTest(model=model.__name__):
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    model.objects.create(**fields)
+
+    def test_post_counter(self):
+        """Создание поста увеличивает счетчик постов автора."""
+        self.client.post(reverse('posts:post_create'), data={'text': 'Новый'})
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.posts_count, 1)
+
+    def test_recount_counters(self):
+        """recount_counters чинит рассинхронизированные счетчики."""
+        Like.objects.create(user=self.user, post=self.post)
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=7)
+        call_command('recount_counters', batch_size=1, stdout=StringIO())
+        self.assertCounters(likes=1, comments=0, followers=1)
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 1)
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(text='Старый', author=cls.author)
+
+    def setUp(self):
+        self.client = Client(HTTP_REFERER='/')
+        self.client.force_login(self.user)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_feed_fan_out(self):
+        """Подписка добавляет посты автора в ленту, новые посты
+        раскладываются при публикации, отписка чистит ленту."""
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': self.author.username}))
+        self.assertEqual(self.feed(), [self.old_post])
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, post=new_post).exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': self.author.username}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_feed_celebrity_read(self):
+        """Посты авторов сверх лимита подмешиваются при чтении."""
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': self.author.username}))
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        self.assertFalse(FeedEntry.objects.filter(post=new_post).exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    @override_settings(CURSOR_PAGINATION=True)
+    def test_feed_page_pagination(self):
+        """Лента листается по страницам и при курсорной пагинации."""
+        actions.follow(self.user, self.author)
+        response = self.client.get(reverse('posts:follow_index'),
+                                   {'cursor': ''})
+        page = response.context['page_obj']
+        self.assertEqual(page.number, 1)
+        self.assertEqual(list(page), [self.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_feed_catch_up_below_limit(self):
+        """Автор, опустившийся до лимита, досылает в ленты посты, которые
+        не раскладывались, пока подписчиков было больше."""
+        fan = User.objects.create_user(username='fan')
+        actions.follow(self.user, self.author)
+        actions.follow(fan, self.author)
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        self.assertFalse(FeedEntry.objects.filter(post=new_post).exists())
+        actions.unfollow(self.user, self.author)
+        self.assertEqual(
+            set(FeedEntry.objects.filter(user=fan).values_list(
+                'post', flat=True
+            )),
+            {new_post.pk, self.old_post.pk}
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_feed_catch_up_after_recount(self):
+        """Счетчик, перескочивший лимит при пересчете, тоже догоняет
+        ленты."""
+        fan = User.objects.create_user(username='fan')
+        actions.follow(self.user, self.author)
+        actions.follow(fan, self.author)
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        Follow.objects.filter(user=self.user).delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.assertTrue(
+            FeedEntry.objects.filter(user=fan, post=new_post).exists()
+        )
+
+
+@override_settings(CURSOR_PAGINATION=True)
+class CursorPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Группа', slug='cursor')
+        Post.objects.bulk_create([
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(25)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        caches['posts'].clear()
+        self.client = Client()
+
+    def test_cursor_pages_cover_all_posts(self):
+        """Курсорные страницы идут по порядку без повторов и пропусков."""
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+        )
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        for address in addresses:
+            with self.subTest(address=address):
+                seen, cursor = [], ''
+                while cursor is not None:
+                    response = self.client.get(address, {'cursor': cursor})
+                    page = response.context['page_obj']
+                    seen.extend(page)
+                    cursor = page.next_cursor
+                self.assertEqual(seen, expected)
+                self.assertEqual(page.paginator.count, len(expected))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('posts:index'),
+                                   {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class PeopleListTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='star')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        for i in range(25):
+            fan = User.objects.create_user(username=f'fan_{i:02}')
+            Follow.objects.create(user=fan, author=cls.author)
+            Like.objects.create(user=fan, post=cls.post)
+
+    def setUp(self):
+        cache.clear()
+        caches['posts'].clear()
+        self.client = Client()
+
+    def test_sidebar_preview_is_bounded(self):
+        """Боковая панель показывает только превью и ссылку на продолжение."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        for key, url in (
+            ('followers_page', reverse('posts:followers',
+                                       kwargs={'username': 'star'})),
+            ('likes_page', reverse('posts:post_likes',
+                                   kwargs={'post_id': self.post.pk})),
+        ):
+            with self.subTest(key=key):
+                page = response.context[key]
+                self.assertEqual(len(page), 5)
+                self.assertContains(
+                    response, f'{url}?cursor={page.next_cursor}'
+                )
+
+    def test_people_pages(self):
+        """Страницы подписчиков и лайков отдают всех без повторов."""
+        addresses = (
+            reverse('posts:followers', kwargs={'username': 'star'}),
+            reverse('posts:post_likes', kwargs={'post_id': self.post.pk}),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                seen, cursor = [], ''
+                while cursor is not None:
+                    response = self.client.get(
+                        address, {'cursor': cursor},
+                        HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+                    )
+                    self.assertNotContains(response, '<html')
+                    page = response.context['page_obj']
+                    seen.extend(row.user.username for row in page)
+                    cursor = page.next_cursor
+                self.assertEqual(
+                    seen, [f'fan_{i:02}' for i in reversed(range(25))]
+                )
+
+    def test_people_pages_not_found(self):
+        for address in (
+            reverse('posts:followers', kwargs={'username': 'nobody'}),
+            reverse('posts:post_likes', kwargs={'post_id': 0}),
+        ):
+            with self.subTest(address=address):
+                self.assertEqual(self.client.get(address).status_code, 404)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.group = Group.objects.create(title='Группа', slug='http')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        caches['posts'].clear()
+        self.guest = Client()
+        self.addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'http'}),
+            reverse('posts:profile', kwargs={'username': 'writer'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def revalidate(self, address, response):
+        return self.guest.get(address, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified(self):
+        """Анонимный повторный запрос без изменений получает 304 и
+        заголовки для обратного прокси."""
+        for address in self.addresses:
+            with self.subTest(address=address):
+                response = self.guest.get(address)
+                self.assertIn('Last-Modified', response)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('max-age=', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                self.assertEqual(
+                    self.revalidate(address, response).status_code, 304
+                )
+
+    def test_changes_invalidate(self):
+        """Лайк, комментарий и подписка меняют ETag затронутых страниц."""
+        fan = Client()
+        fan.force_login(self.fan)
+        post_kwargs = {'post_id': self.post.pk}
+        for name, kwargs, data in (
+            ('posts:post_like', post_kwargs, None),
+            ('posts:add_comment', post_kwargs, {'text': 'Комментарий'}),
+            ('posts:profile_follow', {'username': 'writer'}, None),
+        ):
+            responses = {address: self.guest.get(address)
+                         for address in self.addresses[2:]}
+            fan.post(reverse(name, kwargs=kwargs), data)
+            for address, response in responses.items():
+                with self.subTest(action=name, address=address):
+                    self.assertEqual(
+                        self.revalidate(address, response).status_code, 200
+                    )
+
+    def test_changes_stay_in_scope(self):
+        """Лайк не сбрасывает страницы, на которых поста нет."""
+        User.objects.create_user(username='other')
+        Group.objects.create(title='Другая', slug='other')
+        unrelated = (
+            reverse('posts:group_list', kwargs={'slug': 'other'}),
+            reverse('posts:profile', kwargs={'username': 'other'}),
+        )
+        related = (self.addresses[0], self.addresses[1])
+        responses = {address: self.guest.get(address)
+                     for address in unrelated + related}
+        fan = Client()
+        fan.force_login(self.fan)
+        fan.post(reverse('posts:post_like',
+                         kwargs={'post_id': self.post.pk}))
+        for address, response in responses.items():
+            with self.subTest(address=address):
+                self.assertEqual(
+                    self.revalidate(address, response).status_code,
+                    304 if address in unrelated else 200
+                )
+
+    def test_touch_repeats_after_commit(self):
+        """Отметка сдвигается еще раз после коммита, чтобы страница,
+        собранная по старым строкам до коммита, не осталась в кеше."""
+        with transaction.atomic():
+            touch_pages('commit')
+        before = last_changed('commit')
+        _, touch = connection.run_on_commit[-1]
+        touch()
+        self.assertGreater(last_changed('commit'), before)
+
+    def test_anonymous_page_cache(self):
+        """Повторная страница для анонима не ходит в базу, лайк ее
+        обновляет."""
+        address = self.addresses[0]
+        self.guest.get(address)
+        with self.assertNumQueries(0):
+            self.guest.get(address)
+        fan = Client()
+        fan.force_login(self.fan)
+        fan.post(reverse('posts:post_like',
+                         kwargs={'post_id': self.post.pk}))
+        response = self.guest.get(address)
+        self.assertEqual(response.context['page_obj'][0].likes_count, 1)
+
+    def test_concurrent_misses_render_once(self):
+        """Пока страницу рендерит другой запрос, отдается прежняя копия."""
+        renders = []
+
+        def render():
+            renders.append(1)
+            return HttpResponse(f'версия {len(renders)}')
+
+        url = '/cached/'
+        cached_page(url, 1, render)
+        self.assertEqual(cached_page(url, 1, render)[1].content,
+                         'версия 1'.encode())
+        with override_settings(PAGE_RENDER_WAIT_SEC=0):
+            caches['posts'].add(
+                PAGE_LOCK_KEY.format(hashlib.md5(url.encode()).hexdigest()),
+                True
+            )
+            stamp, response = cached_page(url, 2, render)
+        self.assertEqual((stamp, response.content),
+                         (1, 'версия 1'.encode()))
+        self.assertEqual(len(renders), 1)
+
+    def test_authenticated_pages_are_private(self):
+        """Страницы вошедшего пользователя не отдаются общим кешам."""
+        client = Client()
+        client.force_login(self.fan)
+        response = client.get(self.addresses[0])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('ETag', response)
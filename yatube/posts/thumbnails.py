@@ -0,0 +1,101 @@
+"""Фоновая нарезка миниатюр для картинок постов.
+
+Все размеры, которые показывают шаблоны, перечислены в PRESETS. После
+сохранения поста с новой картинкой миниатюры всех размеров режутся в пуле
+потоков, а адрес готовой миниатюры кладется в кеш. До готовности тег
+{% post_picture %} отдает оригинал вместо того, чтобы резать картинку в
+запросе. Там же режутся адаптивные варианты из posts.variants.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import get_thumbnail
+
+from . import variants
+from .caching import bump_card_version, touch_post
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+PRESETS = {
+    'card': ('1080x381', {'crop': 'center', 'upscale': True}),
+    'preview': ('960x670', {'crop': 'center'}),
+}
+PENDING_KEY = 'thumbnails:pending:{}'
+THUMBNAIL_KEY = 'thumbnails:url:{}:{}'
+PENDING_SEC = 60 * 5
+
+cache = caches['posts']
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def cached_thumbnail(image, preset):
+    """Адрес нарезанной миниатюры из кеша или None, без обращения к
+    sorl-thumbnail. Если адрес вытеснен, миниатюра нарезается заново:
+    sorl-thumbnail найдет готовый файл и вернет его сразу."""
+    return cache.get(THUMBNAIL_KEY.format(preset, image.name))
+
+
+def generate(name, post_id):
+    """Режет все миниатюры картинки; выполняется в потоке пула.
+
+    Пока миниатюр не было, в кеш карточки мог попасть оригинал, поэтому
+    после нарезки версия карточки сдвигается. Хеш вариантов записывается
+    только если картинку поста за это время не заменили.
+    """
+    try:
+        for preset, (geometry, options) in PRESETS.items():
+            thumbnail = get_thumbnail(name, geometry, **options)
+            cache.set(THUMBNAIL_KEY.format(preset, name), thumbnail.url,
+                      None)
+        image_hash = variants.generate(name)
+        Post.objects.filter(pk=post_id, image=name).update(
+            image_hash=image_hash
+        )
+    except Exception:
+        logger.exception('Не удалось нарезать миниатюры для %s', name)
+    finally:
+        cache.delete(PENDING_KEY.format(name))
+        bump_card_version(post_id)
+        post = Post.objects.only('author_id', 'group_id').filter(
+            pk=post_id
+        ).first()
+        if post:
+            touch_post(post)
+        close_old_connections()
+
+
+def schedule(image):
+    """Ставит нарезку в очередь после коммита транзакции с постом."""
+    if not image or cache.get(PENDING_KEY.format(image.name)):
+        return
+    cache.set(PENDING_KEY.format(image.name), True, PENDING_SEC)
+    name, post_id = image.name, image.instance.pk
+    if settings.THUMBNAIL_ASYNC:
+        transaction.on_commit(
+            lambda: get_executor().submit(generate, name, post_id)
+        )
+    else:
+        transaction.on_commit(lambda: generate(name, post_id))
+
+
+def thumbnail_url(image, preset):
+    """Адрес миниатюры, а пока она не нарезана - оригинала."""
+    url = cached_thumbnail(image, preset)
+    if url:
+        return url
+    schedule(image)
+    return image.url
@@ -0,0 +1,100 @@
+"""Проверка и очистка картинок, загружаемых в посты.
+
+Размер файла проверяется до того, как его откроет Pillow, размеры
+картинки - по заголовку, без декодирования пикселей. Прошедшая проверку
+картинка перекодируется без EXIF во временный файл, который уходит
+на диск, если не помещается в FILE_UPLOAD_MAX_MEMORY_SIZE.
+"""
+from tempfile import SpooledTemporaryFile
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# Форматы, в которых бывают EXIF и другие метаданные, и их настройки.
+REENCODE = {
+    'JPEG': {'quality': 90},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+
+def read_size(file):
+    """(ширина, высота) из заголовка или None, если это не картинка."""
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            return image.size
+    except Image.DecompressionBombError:
+        raise
+    except Exception:
+        return None
+    finally:
+        file.seek(0)
+
+
+def strip_metadata(file):
+    """Перекодирует картинку без EXIF, учитывая поворот из EXIF."""
+    file.seek(0)
+    with Image.open(file) as source:
+        fmt = source.format
+        if fmt not in REENCODE:
+            file.seek(0)
+            return file
+        image = ImageOps.exif_transpose(source)
+        buffer = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        image.save(
+            buffer, fmt,
+            icc_profile=source.info.get('icc_profile'), **REENCODE[fmt]
+        )
+    output = UploadedFile(
+        buffer, file.name, file.content_type, buffer.tell()
+    )
+    output.seek(0)
+    output.image = image
+    return output
+
+
+class PostImageField(forms.ImageField):
+    default_error_messages = {
+        'too_large': 'Файл больше %(limit)s.',
+        'too_big': 'Картинка должна быть не больше %(side)s пикселей '
+                   'по каждой стороне и %(pixels)s мегапикселей.',
+    }
+
+    def to_python(self, data):
+        if data in self.empty_values:
+            return super().to_python(data)
+        if (getattr(data, 'truncated', False)
+                or data.size > settings.FILE_UPLOAD_MAX_BYTES):
+            raise forms.ValidationError(
+                self.error_messages['too_large'], code='too_large',
+                params={'limit': filesizeformat(
+                    settings.FILE_UPLOAD_MAX_BYTES
+                )},
+            )
+        self.check_dimensions(data)
+        return strip_metadata(super().to_python(data))
+
+    def check_dimensions(self, data):
+        try:
+            size = read_size(data)
+        except Image.DecompressionBombError:
+            too_big = True
+        else:
+            too_big = size is not None and (
+                max(size) > settings.POST_IMAGE_MAX_SIDE
+                or size[0] * size[1] > settings.POST_IMAGE_MAX_PIXELS
+            )
+        if too_big:
+            raise forms.ValidationError(
+                self.error_messages['too_big'], code='too_big',
+                params={
+                    'side': settings.POST_IMAGE_MAX_SIDE,
+                    'pixels': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6,
+                },
+            )
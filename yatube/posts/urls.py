@@ -4,8 +4,6 @@ from . import views
 
 app_name = 'posts'
 
-CACHE_SEC = 0
-
 urlpatterns = [
     path('', views.PostIndex.as_view(),
          name='index'),
@@ -24,6 +22,11 @@ urlpatterns = [
          name='add_comment'),
     path('follow/', views.FollowIndex.as_view(),
          name='follow_index'),
+    path(
+        'profile/<str:username>/followers/',
+        views.AuthorFollowers.as_view(),
+        name='followers'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.ProfileFollow.as_view(),
@@ -44,6 +47,11 @@ urlpatterns = [
         views.UnlikePost.as_view(),
         name='post_unlike'
     ),
+    path(
+        'posts/<int:post_id>/likes/',
+        views.PostLikes.as_view(),
+        name='post_likes'
+    ),
     path('posts/<int:post_id>/delete/', views.PostDelete.as_view(),
          name='post_delete'),
     path('posts/com/<int:comment_id>/delete/',
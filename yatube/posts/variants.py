@@ -0,0 +1,118 @@
+"""Адаптивные варианты картинок постов для srcset.
+
+Из картинки поста режется несколько ширин в WebP и JPEG. Имена файлов
+содержат хеш содержимого оригинала, поэтому файл по имени никогда не
+меняется и отдается с заголовками кеширования на год. Хеш сохраняется
+в Post.image_hash после нарезки вместе с шириной оригинала: пока он
+пустой, шаблоны показывают одну миниатюру, как раньше. Картинки не
+увеличиваются: ширины больше оригинала не режутся (widths_for).
+"""
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+# Ширины и пропорции вариантов; None - без обрезки, как оригинал.
+PRESETS = {
+    'card': ((360, 720, 1080), 1080 / 381),
+    'preview': ((320, 480, 960), 960 / 670),
+    'full': ((640, 1280, 1920), None),
+}
+FORMATS = (
+    ('webp', 'WEBP', 'image/webp'),
+    ('jpg', 'JPEG', 'image/jpeg'),
+)
+QUALITY = 80
+
+
+def formats():
+    """Форматы, которые умеет сохранять установленный Pillow."""
+    return [
+        item for item in FORMATS
+        if item[1] != 'WEBP' or features.check('webp')
+    ]
+
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()[:20]
+
+
+def widths_for(preset, source_width):
+    """Ширины пресета, не превышающие ширину оригинала; если оригинал уже
+    всех - одна его собственная ширина. None - ширина неизвестна
+    (хеш до ее учета), тогда все ширины пресета."""
+    widths, _ = PRESETS[preset]
+    if source_width is None:
+        return widths
+    return tuple(w for w in widths if w <= source_width) or (source_width,)
+
+
+def source_width(image_hash):
+    """Ширина оригинала из хеша вида '<хеш содержимого>-<ширина>'."""
+    _, _, width = image_hash.partition('-')
+    return int(width) if width else None
+
+
+def variant_name(image_hash, preset, width, ext):
+    return (
+        f'{settings.IMAGE_VARIANTS_DIR}{image_hash}-{preset}-{width}.{ext}'
+    )
+
+
+def resize(image, width, ratio):
+    if ratio is None:
+        height = max(1, round(image.height * width / image.width))
+        return image.resize((width, height), Image.LANCZOS)
+    return ImageOps.fit(
+        image, (width, max(1, round(width / ratio))), Image.LANCZOS
+    )
+
+
+def encode(image, fmt):
+    if fmt == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB' if fmt == 'JPEG' else 'RGBA')
+    buffer = BytesIO()
+    image.save(buffer, fmt, quality=QUALITY, optimize=fmt == 'JPEG')
+    return buffer.getvalue()
+
+
+def generate(name):
+    """Режет варианты картинки и возвращает хеш ее содержимого с шириной
+    оригинала.
+
+    Уже существующие файлы пропускаются: одинаковые картинки разных
+    постов делят одни и те же варианты.
+    """
+    with default_storage.open(name) as source:
+        data = source.read()
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image_hash = f'{content_hash(data)}-{image.width}'
+        for preset, (_, ratio) in PRESETS.items():
+            for width in widths_for(preset, image.width):
+                resized = None
+                for ext, fmt, _ in formats():
+                    target = variant_name(image_hash, preset, width, ext)
+                    if default_storage.exists(target):
+                        continue
+                    if resized is None:
+                        resized = resize(image, width, ratio)
+                    default_storage.save(
+                        target, ContentFile(encode(resized, fmt))
+                    )
+    return image_hash
+
+
+def srcsets(image_hash, preset):
+    """Пары (MIME-тип, srcset) в порядке предпочтения браузером."""
+    widths = widths_for(preset, source_width(image_hash))
+    return [
+        (mime, ', '.join(
+            f'{default_storage.url(variant_name(image_hash, preset, w, ext))}'
+            f' {w}w' for w in widths
+        ))
+        for ext, _, mime in formats()
+    ]
@@ -1,9 +1,28 @@
 from datetime import datetime
+from functools import partial
 
+from django.conf import settings
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date, quote_etag
+from core.paginators import CursorPaginator, InvalidCursor
+from core.uploads import LimitedUploadMixin
+from users.models import Profile
+from . import actions
+from .actions import save_new_post
+from .caching import (
+    attach_card_versions, bump_card_version, cached_page, last_changed,
+    post_author_id, touch_pages
+)
+from .feed import feed_posts
+from .search import get_backend
 from .models import Post, Group, User, Follow, Comment, Like
 from django.contrib.auth.mixins import LoginRequiredMixin
 from .forms import PostForm, CommentForm
+from . import thumbnails
 from django.urls import reverse
 from django.views.generic import (
     ListView,
@@ -15,23 +34,111 @@ from django.views.generic import (
 )
 
 P_COUNT = 10  # количество постов для пагинатора
+PEOPLE_COUNT = 20  # количество пользователей на странице подписчиков/лайков
+
+
+class CursorMixin:
+    """Курсорная пагинация ListView по параметру ?cursor= в адресе."""
+
+    def paginate_by_cursor(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+def preview(queryset):
+    """Первые SIDEBAR_PREVIEW_SIZE пользователей и курсор продолжения."""
+    return CursorPaginator(
+        queryset.select_related('user'), settings.SIDEBAR_PREVIEW_SIZE
+    ).page()
+
+
+class ConditionalMixin:
+    """Условный GET, кеш страниц и заголовки кеширования для анонимов.
+
+    ETag и Last-Modified берутся из отметок изменений в кеше, поэтому на
+    совпавший запрос 304 отдается без выборки постов, а остальные запросы
+    получают готовую страницу из cached_page. Cache-Control: public
+    с max-age из HTTP_CACHE_MAX_AGE по имени маршрута разрешает хранить
+    страницу обратному прокси; страницы вошедших пользователей - private.
+    """
+
+    def changed_scopes(self):
+        return ('index',)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            response = super().dispatch(request, *args, **kwargs)
+            patch_cache_control(response, private=True)
+            return response
+        changed = last_changed(*self.changed_scopes())
+        etag = quote_etag(str(changed))
+        last_modified = changed // 10 ** 9
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            changed, response = cached_page(
+                request.get_full_path(), changed,
+                partial(super().dispatch, request, *args, **kwargs)
+            )
+            if response.status_code == 200:
+                response['ETag'] = quote_etag(str(changed))
+                response['Last-Modified'] = http_date(changed // 10 ** 9)
+        patch_cache_control(
+            response, public=True,
+            max_age=settings.HTTP_CACHE_MAX_AGE.get(
+                request.resolver_match.url_name, 0
+            ),
+        )
+        patch_vary_headers(response, ('Cookie',))
+        return response
 
 
-class DataMixin:
-    """Поключает пагинатор"""
+class DataMixin(CursorMixin):
+    """Поключает пагинатор и общую выборку постов для карточек.
+
+    Постраничный пагинатор остается по умолчанию, курсорный включается
+    настройкой CURSOR_PAGINATION или параметром ?cursor= в адресе.
+    """
     model = Post
     paginate_by = P_COUNT
+    cursor_pagination = True
+
+    def get_posts(self):
+        return Post.objects.for_list(self.request.user)
+
+    def use_cursor(self):
+        return self.cursor_pagination and (
+            settings.CURSOR_PAGINATION or 'cursor' in self.request.GET
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor():
+            return super().paginate_queryset(queryset, page_size)
+        return self.paginate_by_cursor(queryset, page_size)
 
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super().get_context_data(object_list=object_list, **kwargs)
+        attach_card_versions(context['page_obj'])
+        context['card_cache_sec'] = settings.POST_CARD_CACHE_SEC
+        return context
 
-class PostIndex(DataMixin, ListView):
+
+class PostIndex(LimitedUploadMixin, ConditionalMixin, DataMixin, ListView):
     """Главная страница."""
     template_name = 'posts/index.html'
 
     def get_queryset(self):
-        return Post.objects.select_related('author', 'group')
+        return self.get_posts()
 
     def get_context_data(self, *, object_list=None, **kwargs):
-        context = super(PostIndex, self).get_context_data(**kwargs)
+        context = super().get_context_data(**kwargs)
         context['form'] = PostForm
         return context
 
@@ -40,70 +147,85 @@ class PostIndex(DataMixin, ListView):
                         files=request.FILES or None,
                         )
         if form.is_valid():
-            obj = form.save(commit=False)
-            obj.author = self.request.user
-            obj.save()
+            save_new_post(form, self.request.user)
         return redirect(
             'posts:profile', request.user)
 
 
-class PostGroup(DataMixin, ListView):
+class PostGroup(ConditionalMixin, DataMixin, ListView):
     """Страница с постами группы."""
     template_name = 'posts/group_list.html'
 
+    def changed_scopes(self):
+        group_id = get_object_or_404(
+            Group.objects.values_list('pk', flat=True),
+            slug=self.kwargs.get('slug')
+        )
+        return (f'group:{group_id}',)
+
     def get_queryset(self):
         group = get_object_or_404(Group, slug=self.kwargs.get('slug'))
-        return Post.objects.filter(
-            group=group
-        ).select_related('author', 'group').all()
+        return self.get_posts().filter(group=group)
 
 
-class PostProfile(DataMixin, ListView):
+class PostProfile(ConditionalMixin, DataMixin, ListView):
     """Страница с постами пользователя."""
     template_name = 'posts/profile.html'
     author: str
 
+    def changed_scopes(self):
+        author_id = get_object_or_404(
+            User.objects.values_list('pk', flat=True),
+            username=self.kwargs.get('username')
+        )
+        return (f'profile:{author_id}', f'author:{author_id}')
+
     def get_queryset(self):
         self.author = get_object_or_404(
             User, username=self.kwargs.get('username'))
-        return Post.objects.filter(
-            author=self.author
-        ).select_related('author', 'group')
+        return self.get_posts().filter(author=self.author)
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
         context['author'] = self.author
-        if self.request.user.is_authenticated:
-            context['following'] = Follow.objects.filter(
-                user=self.request.user, author=self.author
-            ).exists()
         return context
 
 
-class PostDetail(DetailView):
+class PostDetail(LimitedUploadMixin, ConditionalMixin, DetailView):
     """Страница поста."""
     model = Post
     template_name = 'posts/post_detail.html'
     pk_url_kwarg = 'post_id'
 
+    def changed_scopes(self):
+        post_id = self.kwargs['post_id']
+        try:
+            author_id = post_author_id(post_id)
+        except Post.DoesNotExist:
+            raise Http404('Пост не найден.')
+        return (f'post:{post_id}', f'author:{author_id}')
+
+    def get_queryset(self):
+        return Post.objects.for_detail()
+
     def get_context_data(self, **kwargs):
-        post = get_object_or_404(
-            Post, pk=self.kwargs['post_id'])
-        context = {
+        post = self.object
+        return {
             'form': PostForm(self.request.POST or None,
                              files=self.request.FILES or None,
                              instance=post),
             'comments_form': CommentForm(self.request.POST or None),
-            'comments': post.comments.all().select_related('author', ),
+            'comments': post.comments.all(),
             'post': post,
-            'following': Follow.objects.filter(
-                user=self.request.user, author=post.author
-            ).exists() if self.request.user.is_authenticated else False
+            'followers_page': preview(
+                Follow.objects.filter(author=post.author_id)
+            ),
+            'likes_page': preview(Like.objects.filter(post=post)),
         }
-        return context
 
     def post(self, request, *args, **kwargs):
-        post = self.get_object()
+        post = self.get_object(Post.objects.all())
+        group_id = post.group_id
         form = PostForm(request.POST or None,
                         files=request.FILES or None,
                         instance=post
@@ -111,21 +233,27 @@ class PostDetail(DetailView):
         if form.is_valid() and request.user == post.author:
             obj = form.save(commit=False)
             obj.edit_date = datetime.now()
+            if 'image' in form.changed_data:
+                obj.image_hash = ''
             obj.save()
+            bump_card_version(obj.pk)
+            if group_id and group_id != obj.group_id:
+                # Новую группу отметил сигнал, старую - только здесь.
+                touch_pages(f'group:{group_id}')
+            if 'image' in form.changed_data:
+                thumbnails.schedule(obj.image)
         return redirect(
             'posts:post_detail', kwargs.get('post_id')
         )
 
 
-class PostCreate(LoginRequiredMixin, CreateView):
+class PostCreate(LimitedUploadMixin, LoginRequiredMixin, CreateView):
     """Страница создания поста."""
     form_class = PostForm
     template_name = 'posts/create_post.html'
 
     def form_valid(self, form):
-        obj = form.save(commit=False)
-        obj.author = self.request.user
-        obj.save()
+        save_new_post(form, self.request.user)
         return redirect('posts:profile', self.request.user)
 
     def get_object(self, queryset=None):
@@ -140,7 +268,7 @@ class PostCommentAdd(LoginRequiredMixin, FormView):
         comment = form.save(commit=False)
         comment.author = self.request.user
         comment.post = get_object_or_404(Post, pk=self.kwargs['post_id'])
-        comment.save()
+        actions.add_comment(comment)
         return redirect('posts:post_detail', post_id=self.kwargs['post_id'])
 
     def get(self, request, *args, **kwargs):
@@ -150,35 +278,79 @@ class PostCommentAdd(LoginRequiredMixin, FormView):
 class FollowIndex(LoginRequiredMixin, DataMixin, ListView):
     template_name = 'posts/follow_index.html'
     context_object_name = 'post'
+    # Лента упорядочена по дате записи в ленте, а курсорный пагинатор
+    # пересортировал бы ее по (pub_date, pk) поста.
+    cursor_pagination = False
 
     def get_queryset(self):
-        return Post.objects.filter(author__following__user=self.request.user)
+        return feed_posts(self.get_posts(), self.request.user)
+
+
+def follow_state(author, following):
+    """Ответ на AJAX-подписку: состояние, счетчик и адрес обратного
+    действия для кнопки."""
+    return JsonResponse({
+        'following': following,
+        'followers_count': Profile.objects.values_list(
+            'followers_count', flat=True
+        ).get(user=author),
+        'url': reverse(
+            'posts:profile_unfollow' if following else 'posts:profile_follow',
+            kwargs={'username': author.username}
+        ),
+    })
+
+
+def like_state(post_id, liked):
+    """Ответ на AJAX-лайк: состояние, счетчик и адрес обратного действия."""
+    return JsonResponse({
+        'liked': liked,
+        'likes_count': Post.objects.values_list(
+            'likes_count', flat=True
+        ).get(pk=post_id),
+        'url': reverse('posts:post_unlike' if liked else 'posts:post_like',
+                       kwargs={'post_id': post_id}),
+    })
 
 
 class ProfileFollow(LoginRequiredMixin, View):
-    def get(self, request, username):
-        user = request.user
+    """GET со страницы без JS перенаправляет обратно, POST из скрипта
+    получает JSON без перерисовки страницы."""
+
+    def follow(self, request, username):
         author = get_object_or_404(User, username=username)
-        is_follower = Follow.objects.filter(user=user, author=author)
-        if user != author and not is_follower.exists():
-            Follow.objects.create(user=user, author=author)
+        actions.follow(request.user, author)
+        return author
+
+    def get(self, request, username):
+        self.follow(request, username)
         return redirect(request.META.get('HTTP_REFERER'))
 
+    def post(self, request, username):
+        author = self.follow(request, username)
+        return follow_state(author, author != request.user)
+
 
 class ProfileUnfollow(LoginRequiredMixin, View):
-    def get(self, request, username):
+    def unfollow(self, request, username):
         author = get_object_or_404(User, username=username)
-        is_follower = Follow.objects.filter(user=request.user, author=author)
-        is_follower.delete()
+        actions.unfollow(request.user, author)
+        return author
+
+    def get(self, request, username):
+        self.unfollow(request, username)
         return redirect(request.META.get('HTTP_REFERER'))
 
+    def post(self, request, username):
+        return follow_state(self.unfollow(request, username), False)
+
 
 class PostDelete(View):
     def get(self, request, post_id):
         post = Post.objects.get(id=post_id)
         if post.author != request.user:
             return redirect(request.META.get('HTTP_REFERER'))
-        post.delete()
+        actions.delete_post(post)
         return redirect(request.META.get('HTTP_REFERER'))
 
 
@@ -188,15 +360,17 @@ class CommentDelete(View):
         comment = Comment.objects.get(id=comment_id)
         if comment.author != request.user:
             return redirect(request.META.get('HTTP_REFERER'))
-        comment.delete()
+        actions.delete_comment(comment)
         return redirect(request.META.get('HTTP_REFERER'))
 
 
 class PostTextSearch(DataMixin, ListView):
+    """Поиск по тексту постов, результаты отсортированы по релевантности."""
     template_name = 'posts/search.html'
+    cursor_pagination = False
 
     def get_queryset(self):
-        return Post.objects.filter(text__contains=self.get_object())
+        return get_backend().search(self.get_posts(), self.get_object())
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -204,24 +378,76 @@ class PostTextSearch(DataMixin, ListView):
         return context
 
     def get_object(self):
-        search_query = self.request.GET.get('search', )
+        search_query = self.request.GET.get('search', '')
         return search_query
 
 
 class LikePost(LoginRequiredMixin, View):
+    """GET со страницы без JS перенаправляет обратно, POST из скрипта
+    получает JSON без перерисовки страницы."""
+
     def get(self, request, post_id):
-        user = request.user
         post = get_object_or_404(Post, pk=post_id)
-        is_liked = Like.objects.filter(user=user, post=post)
-        if not is_liked.exists():
-            Like.objects.create(user=user, post=post)
+        actions.like(request.user, post)
         return redirect(request.META.get('HTTP_REFERER'))
 
+    def post(self, request, post_id):
+        actions.like(request.user, get_object_or_404(Post, pk=post_id))
+        return like_state(post_id, True)
+
 
 class UnlikePost(LoginRequiredMixin, View):
     def get(self, request, post_id):
-        user = request.user
         post = get_object_or_404(Post, pk=post_id)
-        is_liked = Like.objects.filter(user=user, post=post)
-        is_liked.delete()
+        actions.unlike(request.user, post)
         return redirect(request.META.get('HTTP_REFERER'))
+
+    def post(self, request, post_id):
+        actions.unlike(request.user, get_object_or_404(Post, pk=post_id))
+        return like_state(post_id, False)
+
+
+class PeopleMixin(CursorMixin):
+    """Постраничный список пользователей из строк Follow или Like.
+
+    На AJAX-запрос отдается только фрагмент списка, который боковая
+    панель поста дописывает к превью.
+    """
+    template_name = 'posts/people.html'
+    paginate_by = PEOPLE_COUNT
+    title: str
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.paginate_by_cursor(
+            queryset.select_related('user'), page_size
+        )
+
+    def get_template_names(self):
+        if self.request.is_ajax():
+            return ['posts/includes/people_items.html']
+        return [self.template_name]
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['people'] = context['page_obj']
+        context['more_url'] = self.request.path
+        context['title'] = self.title
+        return context
+
+
+class AuthorFollowers(PeopleMixin, ListView):
+    """Подписчики автора."""
+
+    def get_queryset(self):
+        author = get_object_or_404(User, username=self.kwargs['username'])
+        self.title = f'Подписчики {author.get_full_name() or author}'
+        return Follow.objects.filter(author=author)
+
+
+class PostLikes(PeopleMixin, ListView):
+    """Пользователи, которые лайкнули пост."""
+
+    def get_queryset(self):
+        post = get_object_or_404(Post, pk=self.kwargs['post_id'])
+        self.title = f'Лайки поста «{post}»'
+        return Like.objects.filter(post=post)
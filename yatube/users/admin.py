@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import Profile
+
+
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'posts_count', 'followers_count')
+    search_fields = ('user__username',)
+
+
+admin.site.register(Profile, ProfileAdmin)
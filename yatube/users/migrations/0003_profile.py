@@ -0,0 +1,57 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:11
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count_subquery(model, field):
+    counter = model.objects.filter(
+        **{field: OuterRef('user')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(
+        Subquery(counter, output_field=models.IntegerField()), 0
+    )
+
+
+def create_profiles(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Profile = apps.get_model('users', 'Profile')
+    Profile.objects.bulk_create(
+        [Profile(user_id=pk) for pk in User.objects.values_list(
+            'pk', flat=True)],
+        batch_size=1000,
+    )
+    Profile.objects.update(
+        posts_count=count_subquery(apps.get_model('posts', 'Post'), 'author'),
+        followers_count=count_subquery(
+            apps.get_model('posts', 'Follow'), 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0002_delete_userread'),
+        ('posts', '0025_auto_20261018_2211'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Количество постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Количество подписчиков')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль',
+                'verbose_name_plural': 'Профили',
+            },
+        ),
+        migrations.RunPython(create_profiles, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,14 @@
-from django.test import TestCase, Client
+import json
+import tempfile
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.contrib.auth.forms import forms
+from posts.models import Post, Like
 
 User = get_user_model()
 
@@ -35,3 +42,49 @@ class UserViewTest(TestCase):
             with self.subTest(value=value):
                 self.assertIsInstance(form.fields[value].widget, field)
         self.assertIsInstance(form.fields['username'], forms.CharField)
+
+
+class UserExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='owner')
+        cls.other = User.objects.create_user(username='other')
+        cls.post = Post.objects.create(text='Мой пост', author=cls.user)
+        Post.objects.create(text='Чужой пост', author=cls.other)
+        Like.objects.create(user=cls.user, post=cls.post)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_export_streams_own_data(self):
+        """Выгрузка отдается потоком JSONL только с данными пользователя."""
+        response = self.client.get(reverse('users:info_export'))
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        records = [json.loads(line) for line in
+                   b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([record['kind'] for record in records],
+                         ['posts', 'likes'])
+        self.assertEqual(records[0]['text'], 'Мой пост')
+        self.assertEqual(records[1]['post'], self.post.pk)
+        self.assertEqual(
+            Client().get(reverse('users:info_export')).status_code, 302
+        )
+
+    def test_export_media_zip(self):
+        """С ?media=1 данные и картинки постов приходят zip-архивом."""
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            (Path(media_root) / 'posts').mkdir()
+            (Path(media_root) / 'posts' / 'pic.gif').write_bytes(b'GIF89a')
+            Post.objects.filter(pk=self.post.pk).update(image='posts/pic.gif')
+            response = self.client.get(reverse('users:info_export'),
+                                       {'media': 1})
+            content = b''.join(response.streaming_content)
+        archive = zipfile.ZipFile(BytesIO(content))
+        self.assertEqual(archive.namelist(),
+                         ['data.jsonl', 'media/posts/pic.gif'])
+        self.assertEqual(archive.read('media/posts/pic.gif'), b'GIF89a')
+        self.assertIn('Мой пост', archive.read('data.jsonl').decode())
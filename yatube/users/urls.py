@@ -85,4 +85,5 @@ urlpatterns = [
     path('info/likes/', TemplateView.as_view(
         template_name='users/includes/info_likes.html'
     ), name='info_likes'),
+    path('info/export/', views.UserExport.as_view(), name='info_export'),
 ]
@@ -1,8 +1,13 @@
-from django.views.generic import CreateView, UpdateView, TemplateView
+from itertools import chain
+
+from django.views.generic import CreateView, UpdateView, TemplateView, View
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import StreamingHttpResponse
 from django.urls import reverse_lazy
 from .forms import CreationForm, UserUpdateForm
 from django.contrib.auth import get_user_model
 from django.shortcuts import redirect
+from posts.exports import media_files, media_names, user_lines, zip_stream
 from posts.models import Post, Like, Comment, Follow
 
 User = get_user_model()
@@ -55,3 +60,30 @@ class UserInfo(TemplateView):
             'last_follows': last_follows,
         })
         return context
+
+
+class UserExport(LoginRequiredMixin, View):
+    """Выгрузка своих данных одним JSONL-потоком, с ?media=1 - zip с
+    data.jsonl и картинками постов. Ответ собирается по мере чтения
+    базы и файлов, память не зависит от объема данных."""
+
+    def get(self, request):
+        user = request.user
+        if request.GET.get('media'):
+            files = [('data.jsonl', user_lines(user))]
+            response = StreamingHttpResponse(
+                zip_stream(chain(files, media_files(media_names(user)))),
+                content_type='application/zip',
+            )
+            filename = f'{user.username}.zip'
+        else:
+            response = StreamingHttpResponse(
+                user_lines(user),
+                content_type='application/x-ndjson; charset=utf-8',
+            )
+            filename = f'{user.username}.jsonl'
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"'
+        )
+        response['Cache-Control'] = 'private, no-store'
+        return response
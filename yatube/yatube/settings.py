@@ -42,6 +42,8 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
+    'benchmarks.apps.BenchmarksConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -49,22 +51,45 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
     'django.contrib.humanize',
     'embed_video',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ViewMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# debug_toolbar только для локальной разработки: под нагрузкой он
+# собирает все SQL и шаблоны каждого запроса.
+DEBUG_TOOLBAR = DEBUG and os.getenv('DEBUG_TOOLBAR', '1') == '1'
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
+# Метрики представлений (core.metrics): размер скользящего окна замеров,
+# заголовок Server-Timing и бюджеты SQL-запросов по имени представления,
+# сверх которых пишется предупреждение в лог. Замеры у каждого процесса
+# свои. Server-Timing по умолчанию выключен, а включенный отдается только
+# персоналу и INTERNAL_IPS, как и эндпоинты метрик.
+METRICS_WINDOW = 1000
+SERVER_TIMING = os.getenv('SERVER_TIMING', '0') == '1'
+DEFAULT_QUERY_BUDGET = 20
+VIEW_QUERY_BUDGETS = {
+    'posts:index': 8,
+    'posts:group_list': 8,
+    'posts:profile': 10,
+    'posts:post_detail': 8,
+    'posts:follow_index': 8,
+}
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
@@ -95,12 +120,64 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# База настраивается окружением: DB_ENGINE=sqlite|sqlite-wal|postgresql.
+# sqlite-wal - профиль для одного сервера: журнал WAL не блокирует чтение
+# на время записи, а писатели ждут друг друга до SQLITE_BUSY_TIMEOUT мс.
+# Для PostgreSQL соединения живут DB_CONN_MAX_AGE секунд и проверяются в
+# начале запроса (DB_HEALTH_CHECKS); DB_PGBOUNCER=1 - режим для pgbouncer
+# с пулом транзакций, где нельзя держать серверные курсоры.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+DB_HEALTH_CHECKS = os.getenv('DB_HEALTH_CHECKS', '1') == '1'
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))
+SQLITE_PRAGMAS = {}
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'yatube'),
+            'USER': os.getenv('DB_USER', 'yatube'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'DISABLE_SERVER_SIDE_CURSORS':
+                os.getenv('DB_PGBOUNCER', '0') == '1',
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+            },
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv(
+                'DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+            ),
+            'OPTIONS': {'timeout': SQLITE_BUSY_TIMEOUT / 1000},
+        }
+    }
+    if DB_ENGINE == 'sqlite-wal':
+        SQLITE_PRAGMAS = {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': SQLITE_BUSY_TIMEOUT,
+        }
+
+# Реплики для чтения: DB_REPLICAS - через запятую хосты PostgreSQL или
+# файлы SQLite. Запись всегда идет в default, а пользователь после своей
+# записи еще REPLICA_PIN_SEC секунд читает из default.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'],
+        **{'HOST' if DB_ENGINE == 'postgresql' else 'NAME': replica},
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_SEC = int(os.getenv('REPLICA_PIN_SEC', '5'))
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -152,8 +229,102 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Кеш настраивается окружением: CACHE_BACKEND=locmem|file|redis|memcached.
+# locmem - только для разработки, у каждого процесса свой кеш; при
+# нескольких воркерах нужен общий бэкенд: file (каталог на общем диске),
+# redis (django-redis) или memcached. У каждого кеша свое место хранения,
+# CACHE_LOCATION_<ИМЯ> (CACHE_LOCATION_POSTS), и свой префикс ключей:
+# clear() одного не задевает другой. Memcached делит сервер, ключи
+# разводит префикс. Версия ключей сдвигается CACHE_VERSION.
+CACHE_BACKENDS = {
+    'locmem': 'core.cache.LocMemCache',
+    'file': 'core.cache.FileBasedCache',
+    'redis': 'core.cache.RedisCache',
+    'memcached': 'core.cache.MemcachedCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_LOCATIONS = {
+    'locmem': {'default': 'yatube', 'posts': 'posts'},
+    'file': {
+        'default': os.path.join(BASE_DIR, 'cache', 'default'),
+        'posts': os.path.join(BASE_DIR, 'cache', 'posts'),
+    },
+    'redis': {
+        'default': 'redis://127.0.0.1:6379/1',
+        'posts': 'redis://127.0.0.1:6379/2',
+    },
+    'memcached': {
+        'default': '127.0.0.1:11211',
+        'posts': '127.0.0.1:11211',
+    },
+}[CACHE_BACKEND]
+CACHE_VERSION = int(os.getenv('CACHE_VERSION', '1'))
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    alias: {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.getenv(
+            f'CACHE_LOCATION_{alias.upper()}', CACHE_LOCATIONS[alias]
+        ),
+        'KEY_PREFIX': prefix,
+        'VERSION': CACHE_VERSION,
     }
+    for alias, prefix in (
+        ('default', 'yatube'),
+        ('posts', 'posts'),
+    )
 }
+
+# Лента подписок: посты раскладываются по лентам подписчиков при публикации.
+# Авторы, у которых подписчиков больше лимита, читаются из ленты напрямую.
+FEED_FANOUT_LIMIT = 10000
+FEED_BACKFILL_SIZE = 100
+# Сколько секунд хранится множество авторов, на которых подписан
+# пользователь; при подписке и отписке оно сбрасывается сразу.
+FOLLOWING_CACHE_SEC = 60 * 60
+
+# Курсорная пагинация лент вместо постраничной (без COUNT(*) и OFFSET).
+CURSOR_PAGINATION = False
+# Сколько секунд хранится приблизительное число постов в курсорном режиме.
+COUNT_CACHE_SEC = 60
+
+# Путь к классу поиска из posts.search, пусто - выбор по движку базы.
+SEARCH_BACKEND = ''
+
+# Сколько секунд живет закешированная общая часть карточки поста.
+POST_CARD_CACHE_SEC = 60 * 10
+
+# Сколько секунд браузер и обратный прокси могут показывать анонимам
+# страницу без перепроверки, по имени маршрута. Остальные страницы
+# получают max-age=0 и перепроверяются условным запросом каждый раз.
+HTTP_CACHE_MAX_AGE = {
+    'index': 30,
+    'group_list': 60,
+    'profile': 60,
+    'post_detail': 60,
+}
+
+# Страницы с HTTP_CACHE_MAX_AGE целиком кешируются для анонимов: сколько
+# секунд копия считается свежей (0 - не кешировать), на сколько берется
+# блокировка рендера и сколько без старой копии ждут чужого рендера.
+ANON_PAGE_CACHE_SEC = 60 * 5
+PAGE_RENDER_LOCK_SEC = 10
+PAGE_RENDER_WAIT_SEC = 2
+
+# Миниатюры картинок постов режутся в фоновом пуле потоков.
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# Адаптивные варианты картинок с хешем содержимого в имени файла; отдаются
+# с заголовками кеширования на год.
+IMAGE_VARIANTS_DIR = 'posts/variants/'
+IMAGE_VARIANTS_MAX_AGE = 60 * 60 * 24 * 365
+
+# Картинки постов пишутся во временный файл, разбор запроса обрывается
+# после лимита (core.uploads.LimitedUploadMixin на формах постов).
+FILE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+# Ограничения картинок постов, проверяются по заголовку до декодирования.
+POST_IMAGE_MAX_SIDE = 8000
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+
+# Сколько подписчиков и лайков показывает боковая панель поста сразу.
+SIDEBAR_PREVIEW_SIZE = 5
@@ -13,10 +13,13 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import os
+
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from core.views import serve_immutable
 from django.conf import settings
 
 
@@ -29,13 +32,25 @@ urlpatterns = [
     path('auth/', include('django.contrib.auth.urls')),
     path('admin/', admin.site.urls),
     path('', include('posts.urls', namespace='posts')),
-    path('about/', include('about.urls', namespace='about'))
+    path('about/', include('about.urls', namespace='about')),
+    path('metrics/', include('core.urls', namespace='core')),
+    path('api/v1/', include('api.urls', namespace='api')),
 ]
 
 if settings.DEBUG:
+    variants_url = settings.MEDIA_URL.lstrip('/') + settings.IMAGE_VARIANTS_DIR
+    urlpatterns += [
+        path(f'{variants_url}<path:path>', serve_immutable, {
+            'document_root': os.path.join(
+                settings.MEDIA_ROOT, settings.IMAGE_VARIANTS_DIR
+            )
+        }),
+    ]
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
+
+if settings.DEBUG_TOOLBAR:
     import debug_toolbar
 
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)